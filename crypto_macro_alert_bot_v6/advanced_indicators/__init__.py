@@ -1,52 +1,308 @@
-from .fibonacci import FibonacciAnalyzer
-from .patterns import PatternRecognizer
-from .elliot_wave import ElliotWaveAnalyzer
-from .fair_value_gap import FairValueGapAnalyzer
-from .candlestick_patterns import CandlestickPatternRecognizer
-from .support_resistance import SupportResistanceAnalyzer
-from .trendlines import TrendlineAnalyzer
-from .gann_angles import GannAngleAnalyzer
-from .momentum_oscillators import MomentumOscillatorAnalyzer
-from .volume_analysis import VolumeAnalyzer
-
-class AdvancedIndicators:
-    def __init__(self):
-        self.fibonacci = FibonacciAnalyzer()
-        self.patterns = PatternRecognizer()
-        self.elliott_wave = ElliotWaveAnalyzer()
-        self.fvg = FairValueGapAnalyzer()
-        self.candlestick = CandlestickPatternRecognizer()
-        self.support_resistance = SupportResistanceAnalyzer()
-        self.trendlines = TrendlineAnalyzer()
-        self.gann = GannAngleAnalyzer()
-        self.momentum = MomentumOscillatorAnalyzer()
-        self.volume = VolumeAnalyzer()
-    
-    def analyze_all(self, df, symbol, timeframe):
-        """Phân tích tất cả các chỉ báo nâng cao"""
-        analysis = {
-            'fibonacci': self.fibonacci.identify_fibonacci_retracement(df, symbol, timeframe),
-            'patterns': {
-                'head_and_shoulders': self.patterns.identify_head_and_shoulders(df),
-                'double_top': self.patterns.identify_double_top(df),
-                'double_bottom': self.patterns.identify_double_bottom(df),
-                'triangle': self.patterns.identify_triangle(df),
-                'wedge': self.patterns.identify_wedge(df)
-            },
-            'elliott_wave': self.elliott_wave.identify_elliott_waves(df),
-            'fvg': self.fvg.calculate_fvg(df),
-            'candlestick': {
-                'doji': self.candlestick.identify_doji(df),
-                'hammer': self.candlestick.identify_hammer(df),
-                'shooting_star': self.candlestick.identify_shooting_star(df),
-                'engulfing': self.candlestick.identify_engulfing(df),
-                'harami': self.candlestick.identify_harami(df)
-            },
-            'support_resistance': self.support_resistance.find_levels(df),
-            'trendlines': self.trendlines.draw_trendlines(df),
-            'gann': self.gann.calculate_gann_angles(df),
-            'momentum': self.momentum.calculate_indicators(df),
-            'volume': self.volume.analyze_volume(df)
-        }
-        
-        return analysis
\ No newline at end of file
+from .fibonacci import FibonacciAnalyzer
+from .patterns import PatternRecognizer
+from .elliot_wave import ElliotWaveAnalyzer
+from .fair_value_gap import FairValueGapAnalyzer
+from .candlestick_patterns import CandlestickPatternRecognizer
+from .support_resistance import SupportResistanceAnalyzer
+from .trendlines import TrendlineAnalyzer
+from .gann_angles import GannAngleAnalyzer
+from .momentum_oscillators import MomentumOscillatorAnalyzer
+from .volume_analysis import VolumeAnalyzer
+from .swing_points import SwingPointIndex
+from .records import SignalBatch, to_dicts
+from contextlib import nullcontext
+import numpy as np
+
+_NULL_STAGE = nullcontext()
+
+# Các nhóm kết quả của analyze_all, theo thứ tự tính
+ANALYSIS_SECTIONS = (
+    'fibonacci', 'patterns', 'elliott_wave', 'fvg', 'candlestick',
+    'support_resistance', 'trendlines', 'gann', 'momentum', 'volume'
+)
+
+# Các nhóm cần chỉ mục đỉnh/đáy
+SWING_SECTIONS = ('patterns', 'elliott_wave', 'support_resistance', 'trendlines')
+
+# Các kết quả mà collect_signals sử dụng
+SIGNAL_OUTPUTS = frozenset({
+    'fibonacci', 'patterns', 'elliott_wave', 'fvg', 'candlestick',
+    'support_resistance.support', 'support_resistance.resistance', 'trendlines',
+    'momentum.rsi', 'momentum.macd', 'volume.volume_signals'
+})
+
+class AdvancedIndicators:
+    def __init__(self, swing_windows=(5, 20), profiler=None):
+        self.fibonacci = FibonacciAnalyzer()
+        self.patterns = PatternRecognizer()
+        self.elliott_wave = ElliotWaveAnalyzer()
+        self.fvg = FairValueGapAnalyzer()
+        self.candlestick = CandlestickPatternRecognizer()
+        self.support_resistance = SupportResistanceAnalyzer()
+        self.trendlines = TrendlineAnalyzer()
+        self.gann = GannAngleAnalyzer()
+        self.momentum = MomentumOscillatorAnalyzer()
+        self.volume = VolumeAnalyzer()
+        
+        # Chỉ mục đỉnh/đáy dùng chung: { (symbol, timeframe): (khóa nến cuối, SwingPointIndex) }
+        self.swing_windows = swing_windows
+        self._swing_cache = {}
+        
+        # Profiler tùy chọn (utils.profiling.Profiler) để đo thời gian từng bộ phân tích
+        self.profiler = profiler
+    
+    def get_swing_index(self, df, symbol, timeframe):
+        """Lấy chỉ mục đỉnh/đáy, chỉ tính lại khi nến cuối cùng thay đổi"""
+        candle_key = (len(df), df.index[0], df.index[-1], df['high'].iloc[-1], df['low'].iloc[-1])
+        cached = self._swing_cache.get((symbol, timeframe))
+        if cached is not None and cached[0] == candle_key:
+            return cached[1]
+        
+        swing_index = SwingPointIndex(df, windows=self.swing_windows)
+        self._swing_cache[(symbol, timeframe)] = (candle_key, swing_index)
+        return swing_index
+    
+    def analyze_all(self, df, symbol, timeframe, outputs=None, precomputed=None):
+        """Phân tích các chỉ báo nâng cao.
+        
+        outputs: tập các khóa cần tính, dạng 'section' hoặc 'section.part'
+        (vd. {'fibonacci', 'momentum.rsi'}); None = tính tất cả. Các bộ phân tích
+        và các phần không được yêu cầu sẽ không được tính.
+        precomputed: chuỗi động lượng đã tính sẵn (momentum_oscillators.precomputed_series).
+        """
+        stage = self._stage
+        requested = self._parse_outputs(outputs)
+        analysis = {}
+        
+        def needs(section):
+            return requested is None or section in requested
+        
+        def parts(section):
+            return None if requested is None else requested[section]
+        
+        swing_index = None
+        if any(needs(section) for section in SWING_SECTIONS):
+            with stage('swing_index'):
+                swing_index = self.get_swing_index(df, symbol, timeframe)
+        
+        if needs('fibonacci'):
+            with stage('fibonacci'):
+                analysis['fibonacci'] = self.fibonacci.identify_fibonacci_retracement(df, symbol, timeframe)
+        
+        if needs('patterns'):
+            detectors = {
+                'head_and_shoulders': lambda: self.patterns.identify_head_and_shoulders(df, swing_index),
+                'double_top': lambda: self.patterns.identify_double_top(df, swing_index),
+                'double_bottom': lambda: self.patterns.identify_double_bottom(df, swing_index),
+                'triangle': lambda: self.patterns.identify_triangle(df),
+                'wedge': lambda: self.patterns.identify_wedge(df)
+            }
+            selected = parts('patterns')
+            with stage('patterns'):
+                analysis['patterns'] = {
+                    name: detect() for name, detect in detectors.items()
+                    if selected is None or name in selected
+                }
+        
+        if needs('elliott_wave'):
+            with stage('elliott_wave'):
+                analysis['elliott_wave'] = self.elliott_wave.identify_elliott_waves(df, swing_index)
+        
+        if needs('fvg'):
+            with stage('fvg'):
+                analysis['fvg'] = self.fvg.calculate_fvg(df)
+        
+        if needs('candlestick'):
+            with stage('candlestick'):
+                analysis['candlestick'] = self.candlestick.identify_all(df)
+        
+        if needs('support_resistance'):
+            selected = parts('support_resistance')
+            with stage('support_resistance'):
+                analysis['support_resistance'] = self.support_resistance.find_levels(
+                    df, swing_index=swing_index, include_dynamic=selected is None or 'dynamic' in selected
+                )
+        
+        if needs('trendlines'):
+            with stage('trendlines'):
+                analysis['trendlines'] = self.trendlines.draw_trendlines(df, swing_index)
+        
+        if needs('gann'):
+            with stage('gann'):
+                analysis['gann'] = self.gann.calculate_gann_angles(df)
+        
+        if needs('momentum'):
+            with stage('momentum'):
+                analysis['momentum'] = self.momentum.calculate_indicators(
+                    df, include=parts('momentum'), precomputed=precomputed
+                )
+        
+        if needs('volume'):
+            with stage('volume'):
+                analysis['volume'] = self.volume.analyze_volume(df, include=parts('volume'))
+        
+        return self._select_parts(analysis, requested)
+    
+    def collect_signals(self, df, analysis):
+        """Tổng hợp kết quả analyze_all thành các tín hiệu nâng cao và tín hiệu động lượng"""
+        # Tổng hợp các tín hiệu
+        signals = []
+        
+        # Fibonacci signals
+        if analysis['fibonacci']['near_levels']:
+            for level, price in analysis['fibonacci']['near_levels']:
+                signals.append({
+                    'type': 'Fibonacci',
+                    'message': f"Giá đang gần mức Fibonacci {level} ({price:.2f})",
+                    'strength': 0.6
+                })
+        
+        # Pattern signals
+        for pattern_name, pattern in analysis['patterns'].items():
+            if pattern['detected']:
+                signals.append({
+                    'type': pattern['name'],
+                    'message': f"Phát hiện {pattern['name']} với độ tin cậy {pattern['strength']*100:.0f}%",
+                    'strength': pattern['strength']
+                })
+        
+        # Elliott Wave signals
+        if analysis['elliott_wave']['pattern']:
+            signals.append({
+                'type': 'Elliott Wave',
+                'message': f"Mẫu hình sóng Elliott: {analysis['elliott_wave']['pattern']}",
+                'strength': analysis['elliott_wave']['confidence']
+            })
+        
+        # FVG signals
+        fvg_signals = self.fvg.identify_fvg_signals(df, analysis['fvg'])
+        for signal in fvg_signals:
+            signals.append({
+                'type': 'FVG',
+                'message': f"Fair Value Gap {signal['direction']}",
+                'strength': signal['strength']
+            })
+        
+        # Candlestick signals (đọc thẳng từ các cột, không dựng dict cho từng nến)
+        for pattern_type, patterns in analysis['candlestick'].items():
+            for name, strength in zip(patterns.column('type').tolist(), patterns.columns['strength'].tolist()):
+                signals.append({
+                    'type': 'Candlestick',
+                    'message': f"Mẫu nến {name}",
+                    'strength': strength
+                })
+        
+        # Support/Resistance signals
+        current_price = df['close'].iloc[-1]
+        for side, signal_type, label in (('support', 'Support', 'hỗ trợ'), ('resistance', 'Resistance', 'kháng cự')):
+            levels = analysis['support_resistance'][side]
+            near = np.abs(current_price - levels.columns['price']) / current_price < 0.02
+            for level in levels.select(near):
+                signals.append({
+                    'type': signal_type,
+                    'message': f"Giá đang gần mức {label} {level['price']:.2f}",
+                    'strength': level['strength']
+                })
+        
+        # Trendline signals
+        for trendline in analysis['trendlines']['uptrend']:
+            signals.append({
+                'type': 'Uptrend',
+                'message': f"Đường xu hướng tăng được xác nhận",
+                'strength': trendline['strength']
+            })
+        
+        for trendline in analysis['trendlines']['downtrend']:
+            signals.append({
+                'type': 'Downtrend',
+                'message': f"Đường xu hướng giảm được xác nhận",
+                'strength': trendline['strength']
+            })
+        
+        # Momentum signals
+        momentum_signals = []
+        
+        # RSI signals
+        rsi = analysis['momentum']['rsi']
+        if rsi['signal'] == 'overbought':
+            momentum_signals.append({
+                'type': 'RSI Overbought',
+                'message': f"RSI ở vùng quá mua ({rsi['current']:.2f})",
+                'strength': 0.7,
+                'direction': 'bearish'
+            })
+        elif rsi['signal'] == 'oversold':
+            momentum_signals.append({
+                'type': 'RSI Oversold',
+                'message': f"RSI ở vùng quá bán ({rsi['current']:.2f})",
+                'strength': 0.7,
+                'direction': 'bullish'
+            })
+        
+        # MACD signals
+        macd = analysis['momentum']['macd']
+        if macd['signal'] == 'bullish':
+            momentum_signals.append({
+                'type': 'MACD Bullish',
+                'message': "MACD có tín hiệu tăng",
+                'strength': 0.6,
+                'direction': 'bullish'
+            })
+        elif macd['signal'] == 'bearish':
+            momentum_signals.append({
+                'type': 'MACD Bearish',
+                'message': "MACD có tín hiệu giảm",
+                'strength': 0.6,
+                'direction': 'bearish'
+            })
+        
+        # Volume signals
+        for volume_signal in analysis['volume']['volume_signals']:
+            signals.append({
+                'type': volume_signal['type'],
+                'message': volume_signal['message'],
+                'strength': volume_signal['strength']
+            })
+        
+        return signals, momentum_signals
+    
+    @staticmethod
+    def _parse_outputs(outputs):
+        """{section: None (toàn bộ) hoặc tập các phần} từ tập khóa outputs"""
+        if outputs is None:
+            return None
+        
+        requested = {}
+        for key in outputs:
+            section, _, part = key.partition('.')
+            if section not in ANALYSIS_SECTIONS:
+                raise ValueError(f"Không có kết quả phân tích: {key}")
+            if not part:
+                requested[section] = None
+            elif section not in requested:
+                requested[section] = {part}
+            elif requested[section] is not None:
+                requested[section].add(part)
+        return requested
+    
+    @staticmethod
+    def _select_parts(analysis, requested):
+        """Chỉ giữ lại các phần được yêu cầu của mỗi nhóm kết quả"""
+        if requested is None:
+            return analysis
+        
+        for section, selected in requested.items():
+            if selected is None:
+                continue
+            result = analysis[section]
+            missing = selected - result.keys()
+            if missing:
+                raise ValueError(f"Không có kết quả phân tích: {section}.{sorted(missing)[0]}")
+            analysis[section] = {part: result[part] for part in result if part in selected}
+        return analysis
+    
+    def _stage(self, name):
+        """Giai đoạn được đo bởi profiler (nếu có và đang bật)"""
+        if self.profiler is None or not self.profiler.enabled:
+            return _NULL_STAGE
+        return self.profiler.stage(name)
\ No newline at end of file
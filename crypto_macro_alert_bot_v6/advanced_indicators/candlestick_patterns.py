@@ -1,144 +1,154 @@
 import pandas as pd
 import numpy as np
+from .records import SignalBatch
+
+# Bộ nhãn dùng chung cho các lô bản ghi mẫu nến
+CANDLESTICK_TYPES = (
+    'Doji', 'Hammer', 'Shooting Star', 'Bullish Engulfing', 'Bearish Engulfing',
+    'Bullish Harami', 'Bearish Harami'
+)
+PATTERN_SIGNALS = ('neutral', 'bullish', 'bearish')
 
 class CandlestickPatternRecognizer:
     def __init__(self):
         self.patterns = []
-    
+
+    def compute_masks(self, df):
+        """Tính mặt nạ boolean cho tất cả các mẫu nến trong một lần duyệt"""
+        open_ = df['open'].to_numpy(dtype=float)
+        high = df['high'].to_numpy(dtype=float)
+        low = df['low'].to_numpy(dtype=float)
+        close = df['close'].to_numpy(dtype=float)
+
+        # Các mảng thân, bóng và phạm vi chỉ tính một lần
+        body = np.abs(close - open_)
+        total_range = high - low
+        lower_shadow = open_ - np.minimum(open_, close)
+        upper_shadow = np.maximum(open_, close) - high
+
+        # Dữ liệu nến trước đó (nến đầu tiên không có nến trước -> NaN, mọi so sánh đều False)
+        prev_open = self._shift(open_)
+        prev_high = self._shift(high)
+        prev_low = self._shift(low)
+        prev_close = self._shift(close)
+        prev_body = np.abs(prev_close - prev_open)
+
+        bullish = close > open_
+        bearish = close < open_
+        prev_bullish = prev_close > prev_open
+        prev_bearish = prev_close < prev_open
+
+        # Doji: thân nến rất nhỏ so với tổng phạm vi
+        doji = body < 0.1 * total_range
+        doji[:1] = False
+
+        # Hammer: bóng dài dưới, thân ngắn, bóng trên rất ngắn
+        hammer = (lower_shadow > 2 * body) & (upper_shadow < 0.1 * total_range) & (low < prev_low)
+
+        # Shooting Star: bóng dài trên, thân ngắn, bóng dưới rất ngắn
+        shooting_star = (upper_shadow > 2 * body) & (lower_shadow < 0.1 * total_range) & (high > prev_high)
+
+        # Engulfing: nến hiện tại bao trọn thân nến trước đó
+        bullish_engulfing = bullish & prev_bearish & (open_ < prev_close) & (close > prev_open)
+        bearish_engulfing = bearish & prev_bullish & (open_ > prev_close) & (close < prev_open)
+
+        # Harami: nến hiện tại nằm trong nến trước đó
+        harami = (high < prev_high) & (low > prev_low) & (body < 0.5 * prev_body)
+
+        return {
+            'doji': doji,
+            'hammer': hammer,
+            'shooting_star': shooting_star,
+            'bullish_engulfing': bullish_engulfing,
+            'bearish_engulfing': bearish_engulfing,
+            'bullish_harami': harami & bullish & prev_bearish,
+            'bearish_harami': harami & bearish & prev_bullish
+        }
+
+    def identify_all(self, df):
+        """Nhận diện tất cả các mẫu nến từ một lần tính mặt nạ"""
+        masks = self.compute_masks(df)
+
+        return {
+            'doji': self._doji_records(masks),
+            'hammer': self._hammer_records(masks),
+            'shooting_star': self._shooting_star_records(masks),
+            'engulfing': self._engulfing_records(masks),
+            'harami': self._harami_records(masks)
+        }
+
     def identify_doji(self, df):
         """Nhận diện mẫu hình Doji"""
-        patterns = []
-        
-        for i in range(1, len(df)):
-            candle = df.iloc[i]
-            body = abs(candle['close'] - candle['open'])
-            total_range = candle['high'] - candle['low']
-            
-            # Doji: thân nến rất nhỏ so với tổng phạm vi
-            if body < 0.1 * total_range:
-                patterns.append({
-                    'index': i,
-                    'type': 'Doji',
-                    'strength': 0.5,
-                    'pattern': 'neutral'
-                })
-        
-        return patterns
-    
+        return self._doji_records(self.compute_masks(df))
+
     def identify_hammer(self, df):
         """Nhận diện mẫu hình Hammer"""
-        patterns = []
-        
-        for i in range(1, len(df)):
-            candle = df.iloc[i]
-            body = abs(candle['close'] - candle['open'])
-            lower_shadow = candle['open'] - min(candle['open'], candle['close'])
-            upper_shadow = max(candle['open'], candle['close']) - candle['high']
-            total_range = candle['high'] - candle['low']
-            
-            # Hammer: bóng dài dưới, thân ngắn, bóng trên rất ngắn
-            if (lower_shadow > 2 * body and 
-                upper_shadow < 0.1 * total_range and
-                candle['low'] < df.iloc[i-1]['low']):
-                
-                patterns.append({
-                    'index': i,
-                    'type': 'Hammer',
-                    'strength': 0.7,
-                    'pattern': 'bullish'
-                })
-        
-        return patterns
-    
+        return self._hammer_records(self.compute_masks(df))
+
     def identify_shooting_star(self, df):
         """Nhận diện mẫu hình Shooting Star"""
-        patterns = []
-        
-        for i in range(1, len(df)):
-            candle = df.iloc[i]
-            body = abs(candle['close'] - candle['open'])
-            lower_shadow = candle['open'] - min(candle['open'], candle['close'])
-            upper_shadow = max(candle['open'], candle['close']) - candle['high']
-            total_range = candle['high'] - candle['low']
-            
-            # Shooting Star: bóng dài trên, thân ngắn, bóng dưới rất ngắn
-            if (upper_shadow > 2 * body and 
-                lower_shadow < 0.1 * total_range and
-                candle['high'] > df.iloc[i-1]['high']):
-                
-                patterns.append({
-                    'index': i,
-                    'type': 'Shooting Star',
-                    'strength': 0.7,
-                    'pattern': 'bearish'
-                })
-        
-        return patterns
-    
+        return self._shooting_star_records(self.compute_masks(df))
+
     def identify_engulfing(self, df):
         """Nhận diện mẫu hình Engulfing"""
-        patterns = []
-        
-        for i in range(1, len(df)):
-            current = df.iloc[i]
-            previous = df.iloc[i-1]
-            
-            # Bullish Engulfing: nến xanh bao nến đỏ trước đó
-            if (current['close'] > current['open'] and 
-                previous['close'] < previous['open'] and
-                current['open'] < previous['close'] and
-                current['close'] > previous['open']):
-                
-                patterns.append({
-                    'index': i,
-                    'type': 'Bullish Engulfing',
-                    'strength': 0.8,
-                    'pattern': 'bullish'
-                })
-            
-            # Bearish Engulfing: nến đỏ bao nến xanh trước đó
-            elif (current['close'] < current['open'] and 
-                  previous['close'] > previous['open'] and
-                  current['open'] > previous['close'] and
-                  current['close'] < previous['open']):
-                
-                patterns.append({
-                    'index': i,
-                    'type': 'Bearish Engulfing',
-                    'strength': 0.8,
-                    'pattern': 'bearish'
-                })
-        
-        return patterns
-    
+        return self._engulfing_records(self.compute_masks(df))
+
     def identify_harami(self, df):
         """Nhận diện mẫu hình Harami"""
-        patterns = []
-        
-        for i in range(1, len(df)):
-            current = df.iloc[i]
-            previous = df.iloc[i-1]
-            
-            # Harami: nến hiện tại nằm trong thân nến trước đó
-            if (current['high'] < previous['high'] and 
-                current['low'] > previous['low'] and
-                abs(current['close'] - current['open']) < 0.5 * abs(previous['close'] - previous['open'])):
-                
-                # Xác định Harami tăng hay giảm
-                if current['close'] > current['open'] and previous['close'] < previous['open']:
-                    pattern_type = 'Bullish Harami'
-                    pattern_signal = 'bullish'
-                elif current['close'] < current['open'] and previous['close'] > previous['open']:
-                    pattern_type = 'Bearish Harami'
-                    pattern_signal = 'bearish'
-                else:
-                    continue
-                
-                patterns.append({
-                    'index': i,
-                    'type': pattern_type,
-                    'strength': 0.6,
-                    'pattern': pattern_signal
-                })
-        
-        return patterns
\ No newline at end of file
+        return self._harami_records(self.compute_masks(df))
+
+    def _doji_records(self, masks):
+        return self._build_records(
+            [(masks['doji'], 'Doji', 'neutral')], strength=0.5
+        )
+
+    def _hammer_records(self, masks):
+        return self._build_records(
+            [(masks['hammer'], 'Hammer', 'bullish')], strength=0.7
+        )
+
+    def _shooting_star_records(self, masks):
+        return self._build_records(
+            [(masks['shooting_star'], 'Shooting Star', 'bearish')], strength=0.7
+        )
+
+    def _engulfing_records(self, masks):
+        return self._build_records([
+            (masks['bullish_engulfing'], 'Bullish Engulfing', 'bullish'),
+            (masks['bearish_engulfing'], 'Bearish Engulfing', 'bearish')
+        ], strength=0.8)
+
+    def _harami_records(self, masks):
+        return self._build_records([
+            (masks['bullish_harami'], 'Bullish Harami', 'bullish'),
+            (masks['bearish_harami'], 'Bearish Harami', 'bearish')
+        ], strength=0.6)
+
+    def _build_records(self, variants, strength):
+        """Chuyển các mặt nạ thành lô bản ghi dạng cột, sắp xếp theo vị trí nến"""
+        positions = [np.flatnonzero(mask) for mask, _, _ in variants]
+        index = np.concatenate(positions)
+        types = np.concatenate([
+            np.full(len(found), CANDLESTICK_TYPES.index(pattern_type), dtype=np.int8)
+            for found, (_, pattern_type, _) in zip(positions, variants)
+        ])
+        signals = np.concatenate([
+            np.full(len(found), PATTERN_SIGNALS.index(pattern_signal), dtype=np.int8)
+            for found, (_, _, pattern_signal) in zip(positions, variants)
+        ])
+
+        if len(variants) > 1:
+            order = np.argsort(index, kind='stable')
+            index, types, signals = index[order], types[order], signals[order]
+
+        return SignalBatch(
+            {'index': index, 'type': types, 'strength': np.full(len(index), strength), 'pattern': signals},
+            labels={'type': CANDLESTICK_TYPES, 'pattern': PATTERN_SIGNALS}
+        )
+
+    @staticmethod
+    def _shift(values):
+        shifted = np.empty_like(values)
+        shifted[:1] = np.nan
+        shifted[1:] = values[:-1]
+        return shifted
\ No newline at end of file
@@ -1,11 +1,12 @@
 import pandas as pd
 import numpy as np
+from .swing_points import SwingPointIndex
 
 class ElliotWaveAnalyzer:
     def __init__(self):
         self.waves = []
     
-    def identify_elliott_waves(self, df):
+    def identify_elliott_waves(self, df, swing_index=None):
         """Nhận diện sóng Elliott"""
         waves = {
             'wave_1': None,
@@ -21,50 +22,51 @@ class ElliotWaveAnalyzer:
         }
         
         # Tìm các đỉnh và đáy
-        highs = df['high'].rolling(window=5).max()
-        lows = df['low'].rolling(window=5).min()
-        peaks = highs[(highs.shift(1) < highs) & (highs.shift(-1) < highs)]
-        valleys = lows[(lows.shift(1) > lows) & (lows.shift(-1) > lows)]
+        if swing_index is None:
+            swing_index = SwingPointIndex(df, windows=(5,))
+        swings = swing_index.level(5)
+        peaks = swings.peak_prices
+        valleys = swings.valley_prices
         
         # Đơn giản hóa: chỉ nhận diện sóng 1-2-3-4-5 cơ bản
         if len(peaks) >= 3 and len(valleys) >= 3:
             # Sóng 1 (từ đáy đến đỉnh)
             if len(valleys) > 0 and len(peaks) > 0:
                 waves['wave_1'] = {
-                    'start': valleys.iloc[0],
-                    'end': peaks.iloc[0],
+                    'start': valleys[0],
+                    'end': peaks[0],
                     'type': 'impulsive'
                 }
                 
                 # Sóng 2 (từ đỉnh xuống đáy)
                 if len(valleys) > 1:
                     waves['wave_2'] = {
-                        'start': peaks.iloc[0],
-                        'end': valleys.iloc[1],
+                        'start': peaks[0],
+                        'end': valleys[1],
                         'type': 'corrective'
                     }
                 
                 # Sóng 3 (từ đáy đến đỉnh)
                 if len(peaks) > 1:
                     waves['wave_3'] = {
-                        'start': valleys.iloc[1],
-                        'end': peaks.iloc[1],
+                        'start': valleys[1],
+                        'end': peaks[1],
                         'type': 'impulsive'
                     }
                 
                 # Sóng 4 (từ đỉnh xuống đáy)
                 if len(valleys) > 2:
                     waves['wave_4'] = {
-                        'start': peaks.iloc[1],
-                        'end': valleys.iloc[2],
+                        'start': peaks[1],
+                        'end': valleys[2],
                         'type': 'corrective'
                     }
                 
                 # Sóng 5 (từ đáy đến đỉnh)
                 if len(peaks) > 2:
                     waves['wave_5'] = {
-                        'start': valleys.iloc[2],
-                        'end': peaks.iloc[2],
+                        'start': valleys[2],
+                        'end': peaks[2],
                         'type': 'impulsive'
                     }
                 
@@ -1,59 +1,112 @@
 import pandas as pd
 import numpy as np
+from .records import SignalBatch
+
+FVG_DIRECTIONS = ('bullish', 'bearish')
+FVG_STATUSES = ('unfilled', 'filled')
 
 class FairValueGapAnalyzer:
-    def __init__(self):
+    def __init__(self, proximity=0.02):
         self.fvg_list = []
-    
+        # Khoảng cách tối đa (tỷ lệ so với giá hiện tại) để một FVG còn mở tạo tín hiệu
+        self.proximity = proximity
+
     def calculate_fvg(self, df):
-        """Tính toán Fair Value Gap"""
-        fvg_list = []
-        
-        # Lấy dữ liệu nến
-        for i in range(1, len(df) - 2):
-            current_candle = df.iloc[i]
-            next_candle = df.iloc[i + 1]
-            third_candle = df.iloc[i + 2]
-            
-            # Kiểm tra FVG: nến hiện tại có bóng nến thứ 3 đi qua nến hiện tại
-            if (current_candle['high'] < third_candle['low'] and 
-                next_candle['high'] > current_candle['high']):
-                
-                fvg = {
-                    'index': i,
-                    'start_price': current_candle['high'],
-                    'end_price': third_candle['low'],
-                    'start_time': current_candle.name,
-                    'end_time': third_candle.name,
-                    'status': 'unfilled'
-                }
-                fvg_list.append(fvg)
-        
-        return fvg_list
-    
+        """Tính toán Fair Value Gap (tăng và giảm) kèm thời điểm bị lấp lần đầu"""
+        high = df['high'].to_numpy(dtype=float)
+        low = df['low'].to_numpy(dtype=float)
+        n = len(df)
+
+        # Mẫu 3 nến: nến i, nến i+1 (nến tạo gap) và nến i+2, với 1 <= i <= n-3
+        positions = np.arange(1, max(1, n - 2))
+        bullish = (high[positions] < low[positions + 2]) & (high[positions + 1] > high[positions])
+        bearish = (low[positions] > high[positions + 2]) & (low[positions + 1] < low[positions])
+
+        positions = positions[bullish | bearish]
+        is_bullish = bullish[bullish | bearish]
+
+        # FVG tăng: vùng [high(i), low(i+2)]; FVG giảm: vùng [high(i+2), low(i)]
+        start_price = np.where(is_bullish, high[positions], low[positions])
+        end_price = np.where(is_bullish, low[positions + 2], high[positions + 2])
+
+        # Gap bị lấp khi giá quay lại chạm vào vùng gap sau nến thứ 3
+        mitigated = np.full(len(positions), -1)
+        mitigated[is_bullish] = self._first_touch(low, positions[is_bullish] + 3, end_price[is_bullish], below=True)
+        mitigated[~is_bullish] = self._first_touch(high, positions[~is_bullish] + 3, end_price[~is_bullish], below=False)
+
+        unfilled = mitigated < 0
+        mitigated_positions = np.where(unfilled, 0, mitigated)
+        index = df.index
+
+        columns = {
+            'index': positions,
+            'direction': np.where(is_bullish, 0, 1).astype(np.int8),
+            'start_price': start_price,
+            'end_price': end_price,
+            'start_time': index[positions],
+            'end_time': index[positions + 2],
+            'status': np.where(unfilled, 0, 1).astype(np.int8),
+            'mitigated_index': mitigated_positions,
+            'mitigated_time': index[mitigated_positions]
+        }
+        labels = {'direction': FVG_DIRECTIONS, 'status': FVG_STATUSES}
+        # FVG chưa bị lấp không có thời điểm lấp
+        nulls = {'mitigated_index': unfilled, 'mitigated_time': unfilled}
+
+        return SignalBatch(columns, labels, nulls)
+
+    def open_gaps(self, fvg_list):
+        """Lọc các FVG chưa bị lấp"""
+        return fvg_list.select(fvg_list.column('status') == 'unfilled')
+
     def identify_fvg_signals(self, df, fvg_list):
-        """Nhận diện tín hiệu từ FVG"""
-        signals = []
-        
-        for fvg in fvg_list:
-            # Kiểm tra FVG đã được lấp đầy chưa
-            current_price = df.iloc[-1]['close']
-            
-            if current_price > fvg['start_price']:
-                fvg['status'] = 'filled_bullish'
-                signals.append({
-                    'type': 'FVG Fill',
-                    'direction': 'bullish',
-                    'price': fvg['start_price'],
-                    'strength': 0.7
-                })
-            elif current_price < fvg['end_price']:
-                fvg['status'] = 'filled_bearish'
-                signals.append({
-                    'type': 'FVG Fill',
-                    'direction': 'bearish',
-                    'price': fvg['end_price'],
-                    'strength': 0.7
-                })
-        
-        return signals
\ No newline at end of file
+        """Nhận diện tín hiệu từ các FVG còn mở gần giá hiện tại"""
+        current_price = df['close'].iloc[-1]
+        gaps = self.open_gaps(fvg_list)
+        directions = gaps.column('direction')
+        end_price = gaps.columns['end_price']
+
+        # FVG tăng còn mở nằm dưới giá, FVG giảm còn mở nằm trên giá
+        distance = np.where(directions == 'bullish', current_price - end_price, end_price - current_price) / current_price
+        near = distance < self.proximity
+
+        return [
+            {'type': 'FVG', 'direction': direction, 'price': price, 'strength': 0.7}
+            for direction, price in zip(directions[near].tolist(), end_price[near].tolist())
+        ]
+
+    def _first_touch(self, values, starts, thresholds, below):
+        """Tìm vị trí j >= start đầu tiên có values[j] <= threshold (below) hoặc >= threshold.
+
+        Dùng sparse table min theo lũy thừa 2 và nhảy nhị phân cho tất cả truy vấn cùng lúc:
+        O(n log n) để dựng bảng, O(log n) cho mỗi truy vấn. Trả về -1 nếu không có.
+        """
+        if len(starts) == 0:
+            return np.empty(0, dtype=int)
+
+        # Quy về bài toán "nhỏ hơn hoặc bằng"; NaN không bao giờ chạm ngưỡng
+        if below:
+            values = np.where(np.isnan(values), np.inf, values)
+        else:
+            values = np.where(np.isnan(values), np.inf, -values)
+            thresholds = -thresholds
+
+        n = len(values)
+        table = [values]
+        while (2 << (len(table) - 1)) <= n:
+            half = 1 << (len(table) - 1)
+            previous = table[-1]
+            table.append(np.minimum(previous[:-half], previous[half:]))
+
+        # Bỏ qua các khối [pos, pos + 2^k) mà mọi giá trị đều lớn hơn ngưỡng
+        positions = starts.copy()
+        for k in reversed(range(len(table))):
+            level = table[k]
+            in_range = positions < len(level)
+            block_min = level[np.minimum(positions, len(level) - 1)]
+            skip = in_range & (block_min > thresholds)
+            positions = np.where(skip, positions + (1 << k), positions)
+
+        found = positions < n
+        found[found] = values[positions[found]] <= thresholds[found]
+        return np.where(found, positions, -1)
@@ -1,79 +1,174 @@
 import pandas as pd
 import numpy as np
-from ta.trend import MACD, EMAIndicator
-from ta.momentum import RSIIndicator, StochasticOscillator
-from ta.volatility import BollingerBands
+from numpy.lib.stride_tricks import sliding_window_view
+from .swing_points import rolling_max, rolling_min
+
+# Các chuỗi có thể được tính sẵn (vd. từ trạng thái chỉ báo streaming): tên -> (tham số chu kỳ, các cột)
+PRECOMPUTED_SERIES = {
+    'rsi': ('rsi_window', ('rsi',)),
+    'macd': ('macd_windows', ('macd', 'macd_signal', 'macd_hist')),
+    'stochastic': ('stoch_windows', ('stoch_k', 'stoch_d'))
+}
+
+def precomputed_series(frame, windows):
+    """Gom các cột đã tính sẵn trong frame thành đầu vào `precomputed` của compute_series.
+
+    windows: chu kỳ đã dùng để tính các cột ({'rsi_window': 14, 'macd_windows': (12, 26, 9), ...}).
+    Trả về {tên: (chu kỳ, {cột: mảng numpy})}; chỉ báo thiếu cột hoặc thiếu chu kỳ bị bỏ qua.
+    """
+    return {
+        name: (windows[attribute], {column: frame[column].to_numpy(dtype=float) for column in columns})
+        for name, (attribute, columns) in PRECOMPUTED_SERIES.items()
+        if attribute in windows and all(column in frame.columns for column in columns)
+    }
 
 class MomentumOscillatorAnalyzer:
-    def __init__(self):
+    def __init__(self, rsi_window=14, macd_windows=(12, 26, 9), stoch_windows=(14, 3),
+                 cci_window=20, williams_window=14):
         self.indicators = {}
+        self.rsi_window = rsi_window
+        self.macd_windows = macd_windows
+        self.stoch_windows = stoch_windows
+        self.cci_window = cci_window
+        self.williams_window = williams_window
     
-    def calculate_indicators(self, df):
-        """Tính toán các chỉ báo động lượng và dao động"""
+    def compute_series(self, df, include=None, precomputed=None):
+        """Tính các chuỗi động lượng, mỗi chuỗi đúng một lần, trả về mảng numpy.
+
+        include: tập các chỉ báo cần tính ('rsi', 'macd', 'stochastic', 'cci', 'williams_r'); None = tất cả.
+        precomputed: chuỗi đã tính sẵn (xem precomputed_series); chỉ được dùng lại khi
+        chu kỳ của chúng trùng với chu kỳ của bộ phân tích này, nếu không thì tính lại.
+        """
+        series = {}
+        reused = set()
+        for name, (windows, values) in (precomputed or {}).items():
+            attribute, columns = PRECOMPUTED_SERIES[name]
+            if (include is None or name in include) and windows == getattr(self, attribute):
+                series.update({column: values[column] for column in columns})
+                reused.add(name)
+        
+        def wanted(name):
+            return (include is None or name in include) and name not in reused
+        
+        high = df['high'].to_numpy(dtype=float)
+        low = df['low'].to_numpy(dtype=float)
+        close = df['close'].to_numpy(dtype=float)
+        close_series = pd.Series(close)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # RSI (Wilder): trung bình trượt hàm mũ alpha = 1/window của mức tăng/giảm
+            if wanted('rsi'):
+                diff = np.diff(close, prepend=np.nan)
+                up = pd.Series(np.where(diff > 0, diff, 0.0))
+                down = pd.Series(np.where(diff < 0, -diff, 0.0))
+                ema_up = up.ewm(alpha=1 / self.rsi_window, min_periods=self.rsi_window, adjust=False).mean().to_numpy()
+                ema_down = down.ewm(alpha=1 / self.rsi_window, min_periods=self.rsi_window, adjust=False).mean().to_numpy()
+                series['rsi'] = np.where(ema_down == 0, 100, 100 - (100 / (1 + ema_up / ema_down)))
+            
+            # MACD
+            if wanted('macd'):
+                fast, slow, sign = self.macd_windows
+                ema_fast = close_series.ewm(span=fast, min_periods=fast, adjust=False).mean()
+                ema_slow = close_series.ewm(span=slow, min_periods=slow, adjust=False).mean()
+                macd = ema_fast - ema_slow
+                macd_signal = macd.ewm(span=sign, min_periods=sign, adjust=False).mean()
+                series['macd'] = macd.to_numpy()
+                series['macd_signal'] = macd_signal.to_numpy()
+                series['macd_hist'] = series['macd'] - series['macd_signal']
+            
+            # Stochastic và Williams %R dùng chung đỉnh/đáy trượt khi cùng cửa sổ
+            stoch_window, smooth_window = self.stoch_windows
+            extremes = {}
+            
+            def rolling_extremes(window):
+                if window not in extremes:
+                    extremes[window] = (rolling_max(high, window), rolling_min(low, window))
+                return extremes[window]
+            
+            if wanted('stochastic'):
+                highest, lowest = rolling_extremes(stoch_window)
+                series['stoch_k'] = 100 * (close - lowest) / (highest - lowest)
+                series['stoch_d'] = self._rolling_mean(series['stoch_k'], smooth_window)
+            
+            if wanted('williams_r'):
+                highest, lowest = rolling_extremes(self.williams_window)
+                series['williams_r'] = -100 * (highest - close) / (highest - lowest)
+            
+            # CCI: độ lệch tuyệt đối trung bình tính trên view trượt (không gọi hàm Python cho từng nến)
+            if wanted('cci'):
+                typical_price = (high + low + close) / 3
+                sma_tp = np.full(len(close), np.nan)
+                mad = np.full(len(close), np.nan)
+                if len(close) >= self.cci_window:
+                    windows = sliding_window_view(typical_price, self.cci_window)
+                    window_mean = windows.mean(axis=1)
+                    sma_tp[self.cci_window - 1:] = window_mean
+                    mad[self.cci_window - 1:] = np.abs(windows - window_mean[:, None]).mean(axis=1)
+                series['cci'] = (typical_price - sma_tp) / (0.015 * mad)
+        
+        return series
+    
+    def calculate_indicators(self, df, include=None, precomputed=None):
+        """Tính toán các chỉ báo động lượng và dao động (include: chỉ tính các chỉ báo được yêu cầu)"""
         indicators = {}
+        series = self.compute_series(df, include=include, precomputed=precomputed)
+        
+        def as_series(values):
+            return pd.Series(values, index=df.index)
         
         # RSI
-        rsi_indicator = RSIIndicator(close=df['close'], window=14)
-        indicators['rsi'] = {
-            'values': rsi_indicator.rsi(),
-            'current': rsi_indicator.rsi().iloc[-1],
-            'signal': self.get_rsi_signal(rsi_indicator.rsi().iloc[-1])
-        }
+        if 'rsi' in series:
+            rsi = series['rsi']
+            indicators['rsi'] = {
+                'values': as_series(rsi),
+                'current': rsi[-1],
+                'signal': self.get_rsi_signal(rsi[-1])
+            }
         
-        # MACD
-        macd_indicator = MACD(
-            close=df['close'],
-            window_fast=12,
-            window_slow=26,
-            window_sign=9
-        )
-        indicators['macd'] = {
-            'macd': macd_indicator.macd(),
-            'signal': macd_indicator.macd_signal(),
-            'histogram': macd_indicator.macd_diff(),
-            'signal': self.get_macd_signal(macd_indicator.macd_diff().iloc[-1])
-        }
+        # MACD ('signal' là hướng tín hiệu, đường tín hiệu nằm ở 'signal_line')
+        if 'macd' in series:
+            indicators['macd'] = {
+                'macd': as_series(series['macd']),
+                'signal_line': as_series(series['macd_signal']),
+                'histogram': as_series(series['macd_hist']),
+                'signal': self.get_macd_signal(series['macd_hist'][-1])
+            }
         
         # Stochastic
-        stoch_indicator = StochasticOscillator(
-            high=df['high'],
-            low=df['low'],
-            close=df['close'],
-            window=14,
-            smooth_window=3
-        )
-        indicators['stochastic'] = {
-            'k': stoch_indicator.stoch(),
-            'd': stoch_indicator.stoch_signal(),
-            'signal': self.get_stochastic_signal(
-                stoch_indicator.stoch().iloc[-1],
-                stoch_indicator.stoch_signal().iloc[-1]
-            )
-        }
+        if 'stoch_k' in series:
+            indicators['stochastic'] = {
+                'k': as_series(series['stoch_k']),
+                'd': as_series(series['stoch_d']),
+                'signal': self.get_stochastic_signal(series['stoch_k'][-1], series['stoch_d'][-1])
+            }
         
         # CCI (Commodity Channel Index)
-        typical_price = (df['high'] + df['low'] + df['close']) / 3
-        sma_tp = typical_price.rolling(window=20).mean()
-        mad = typical_price.rolling(window=20).apply(lambda x: np.mean(np.abs(x - np.mean(x))))
-        cci = (typical_price - sma_tp) / (0.015 * mad)
-        
-        indicators['cci'] = {
-            'values': cci,
-            'current': cci.iloc[-1],
-            'signal': self.get_cci_signal(cci.iloc[-1])
-        }
+        if 'cci' in series:
+            cci = series['cci']
+            indicators['cci'] = {
+                'values': as_series(cci),
+                'current': cci[-1],
+                'signal': self.get_cci_signal(cci[-1])
+            }
         
         # Williams %R
-        williams_r = -100 * (df['high'].rolling(window=14).max() - df['close']) / (df['high'].rolling(window=14).max() - df['low'].rolling(window=14).min())
-        
-        indicators['williams_r'] = {
-            'values': williams_r,
-            'current': williams_r.iloc[-1],
-            'signal': self.get_williams_r_signal(williams_r.iloc[-1])
-        }
+        if 'williams_r' in series:
+            williams_r = series['williams_r']
+            indicators['williams_r'] = {
+                'values': as_series(williams_r),
+                'current': williams_r[-1],
+                'signal': self.get_williams_r_signal(williams_r[-1])
+            }
         
         return indicators
     
+    @staticmethod
+    def _rolling_mean(values, window):
+        result = np.full(len(values), np.nan)
+        if len(values) >= window:
+            result[window - 1:] = sliding_window_view(values, window).mean(axis=1)
+        return result
+    
     def get_rsi_signal(self, rsi_value):
         """Lấy tín hiệu từ RSI"""
         if rsi_value > 70:
@@ -1,11 +1,12 @@
 import pandas as pd
 import numpy as np
+from .swing_points import SwingPointIndex
 
 class PatternRecognizer:
     def __init__(self):
         self.patterns = []
     
-    def identify_head_and_shoulders(self, df):
+    def identify_head_and_shoulders(self, df, swing_index=None):
         """Nhận diện mẫu hình Head and Shoulders"""
         pattern = {
             'name': 'Head and Shoulders',
@@ -16,29 +17,29 @@ class PatternRecognizer:
         }
         
         # Tìm 3 đỉnh
-        highs = df['high'].rolling(window=5).max()
-        peaks = highs[(highs.shift(1) < highs) & (highs.shift(-1) < highs)]
+        swings = self._swing_level(df, swing_index)
+        peaks = swings.peak_prices
         
         if len(peaks) >= 3:
             # Lấy 3 đỉnh gần nhất
-            last_3_peaks = peaks.tail(3)
+            last_3_peaks = peaks[-3:]
             
             # Kiểm tra xem có phải là Head and Shoulders không
-            if (last_3_peaks.iloc[0] < last_3_peaks.iloc[1] > last_3_peaks.iloc[2] and
-                abs(last_3_peaks.iloc[0] - last_3_peaks.iloc[2]) < 0.1 * last_3_peaks.iloc[1]):
+            if (last_3_peaks[0] < last_3_peaks[1] > last_3_peaks[2] and
+                abs(last_3_peaks[0] - last_3_peaks[2]) < 0.1 * last_3_peaks[1]):
                 
                 pattern['detected'] = True
                 pattern['strength'] = 0.8
                 pattern['details'] = {
-                    'left_shoulder': last_3_peaks.iloc[0],
-                    'head': last_3_peaks.iloc[1],
-                    'right_shoulder': last_3_peaks.iloc[2],
-                    'neckline': df['low'].rolling(window=5).min().mean()
+                    'left_shoulder': last_3_peaks[0],
+                    'head': last_3_peaks[1],
+                    'right_shoulder': last_3_peaks[2],
+                    'neckline': swings.rolling_low_mean
                 }
         
         return pattern
     
-    def identify_double_top(self, df):
+    def identify_double_top(self, df, swing_index=None):
         """Nhận diện mẫu hình Double Top"""
         pattern = {
             'name': 'Double Top',
@@ -49,25 +50,25 @@ class PatternRecognizer:
         }
         
         # Tìm 2 đỉnh gần nhau
-        highs = df['high'].rolling(window=5).max()
-        peaks = highs[(highs.shift(1) < highs) & (highs.shift(-1) < highs)]
+        swings = self._swing_level(df, swing_index)
+        peaks = swings.peak_prices
         
         if len(peaks) >= 2:
-            last_2_peaks = peaks.tail(2)
+            last_2_peaks = peaks[-2:]
             
             # Kiểm tra xem có phải là Double Top không
-            if abs(last_2_peaks.iloc[0] - last_2_peaks.iloc[1]) < 0.05 * last_2_peaks.iloc[0]:
+            if abs(last_2_peaks[0] - last_2_peaks[1]) < 0.05 * last_2_peaks[0]:
                 pattern['detected'] = True
                 pattern['strength'] = 0.7
                 pattern['details'] = {
-                    'first_top': last_2_peaks.iloc[0],
-                    'second_top': last_2_peaks.iloc[1],
-                    'neckline': df['low'].rolling(window=5).min().mean()
+                    'first_top': last_2_peaks[0],
+                    'second_top': last_2_peaks[1],
+                    'neckline': swings.rolling_low_mean
                 }
         
         return pattern
     
-    def identify_double_bottom(self, df):
+    def identify_double_bottom(self, df, swing_index=None):
         """Nhận diện mẫu hình Double Bottom"""
         pattern = {
             'name': 'Double Bottom',
@@ -78,20 +79,20 @@ class PatternRecognizer:
         }
         
         # Tìm 2 đáy gần nhau
-        lows = df['low'].rolling(window=5).min()
-        valleys = lows[(lows.shift(1) > lows) & (lows.shift(-1) > lows)]
+        swings = self._swing_level(df, swing_index)
+        valleys = swings.valley_prices
         
         if len(valleys) >= 2:
-            last_2_valleys = valleys.tail(2)
+            last_2_valleys = valleys[-2:]
             
             # Kiểm tra xem có phải là Double Bottom không
-            if abs(last_2_valleys.iloc[0] - last_2_valleys.iloc[1]) < 0.05 * last_2_valleys.iloc[0]:
+            if abs(last_2_valleys[0] - last_2_valleys[1]) < 0.05 * last_2_valleys[0]:
                 pattern['detected'] = True
                 pattern['strength'] = 0.7
                 pattern['details'] = {
-                    'first_bottom': last_2_valleys.iloc[0],
-                    'second_bottom': last_2_valleys.iloc[1],
-                    'resistance': df['high'].rolling(window=5).max().mean()
+                    'first_bottom': last_2_valleys[0],
+                    'second_bottom': last_2_valleys[1],
+                    'resistance': swings.rolling_high_mean
                 }
         
         return pattern
@@ -152,4 +153,10 @@ class PatternRecognizer:
                 'type': 'Rising' if high_slope > 0 else 'Falling'
             }
         
-        return pattern
\ No newline at end of file
+        return pattern
+    
+    def _swing_level(self, df, swing_index, window=5):
+        """Lấy đỉnh/đáy từ chỉ mục dùng chung, hoặc tự tính nếu không được truyền vào"""
+        if swing_index is None:
+            swing_index = SwingPointIndex(df, windows=(window,))
+        return swing_index.level(window)
\ No newline at end of file
@@ -0,0 +1,171 @@
+import gc
+import multiprocessing
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+import pandas as pd
+
+from . import AdvancedIndicators, SIGNAL_OUTPUTS
+from .momentum_oscillators import PRECOMPUTED_SERIES, precomputed_series
+
+# Thứ tự các hàng trong khối shared memory; hàng cuối là thời gian mở nến (int64 ns)
+SHARED_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+class SharedOHLCV:
+    """Khối shared memory chứa mảng OHLCV của một cặp/khung thời gian.
+
+    Bố cục: ma trận float64 (k x n) cho OHLCV và các chuỗi động lượng tính sẵn
+    (`precomputed`, vd. từ trạng thái streaming), tiếp theo là n giá trị int64 của index.
+    Tiến trình cha tạo và giải phóng khối; worker chỉ gắn vào bằng tên nên
+    DataFrame không bị pickle khi gửi sang process pool.
+    """
+
+    def __init__(self, df, precomputed=None):
+        bars = len(df)
+        row_bytes = max(1, bars) * 8
+        precomputed = precomputed or {}
+        self.extra = {}
+        for name, (_, values) in precomputed.items():
+            self.extra.update({column: values[column] for column in PRECOMPUTED_SERIES[name][1]})
+        self.columns = SHARED_COLUMNS + tuple(self.extra)
+        self.shm = shared_memory.SharedMemory(create=True, size=row_bytes * (len(self.columns) + 1))
+        try:
+            is_datetime_index, tz = self._write(df, bars)
+        except Exception:
+            self.release()
+            raise
+
+        # Chỉ mô tả này được gửi sang worker
+        self.descriptor = {
+            'name': self.shm.name,
+            'bars': bars,
+            'columns': self.columns,
+            # Chu kỳ của các chuỗi tính sẵn, dạng tham số của MomentumOscillatorAnalyzer
+            'windows': {PRECOMPUTED_SERIES[name][0]: windows for name, (windows, _) in precomputed.items()},
+            'index_name': df.index.name,
+            'is_datetime_index': is_datetime_index,
+            'tz': str(tz) if tz is not None else None
+        }
+
+    def _write(self, df, bars):
+        values, times = _views(self.shm.buf, bars, len(self.columns))
+        values[:len(SHARED_COLUMNS)] = df.loc[:, list(SHARED_COLUMNS)].to_numpy(dtype=float).T
+        for row, column in enumerate(self.extra, start=len(SHARED_COLUMNS)):
+            values[row] = self.extra[column]
+
+        index = df.index
+        if isinstance(index, pd.DatetimeIndex):
+            if index.tz is not None:
+                index = index.tz_convert('UTC').tz_localize(None)
+            times[:] = index.to_numpy(dtype='datetime64[ns]').view(np.int64)
+            return True, df.index.tz
+
+        times[:] = np.asarray(index, dtype=np.int64)
+        return False, None
+
+    def release(self):
+        """Đóng và xóa khối shared memory (gọi ở tiến trình cha)"""
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+def _views(buffer, bars, column_count):
+    """Các view numpy (không copy) của khối shared memory"""
+    values = np.ndarray((column_count, bars), dtype=np.float64, buffer=buffer)
+    times = np.ndarray((bars,), dtype=np.int64, buffer=buffer, offset=column_count * max(1, bars) * 8)
+    return values, times
+
+def frame_from_shared(buffer, descriptor):
+    """Dựng DataFrame trên các view của khối shared memory"""
+    columns = descriptor['columns']
+    values, times = _views(buffer, descriptor['bars'], len(columns))
+    # Index nhỏ (8 byte/nến) nên copy, tránh giữ tham chiếu tới buffer qua cache của pandas
+    times = times.copy()
+    if descriptor['is_datetime_index']:
+        index = pd.DatetimeIndex(times.view('datetime64[ns]'), name=descriptor['index_name'])
+        if descriptor['tz'] is not None:
+            index = index.tz_localize('UTC').tz_convert(descriptor['tz'])
+    else:
+        index = pd.Index(times, name=descriptor['index_name'])
+    return pd.DataFrame({column: values[i] for i, column in enumerate(columns)}, index=index, copy=False)
+
+# Bộ phân tích của từng tiến trình worker (khởi tạo một lần trong initializer)
+_worker_indicators = None
+
+def _init_worker(swing_windows):
+    global _worker_indicators
+    _worker_indicators = AdvancedIndicators(swing_windows=swing_windows)
+    if sys.version_info < (3, 13):
+        # Worker dùng chung resource_tracker với tiến trình cha. Nếu worker đăng ký khối
+        # khi gắn vào rồi hủy đăng ký, lần unlink của tiến trình cha sẽ lỗi; nếu không hủy,
+        # khối có thể bị unlink hoặc cảnh báo "leaked" hai lần. Worker không đăng ký gì cả.
+        register = resource_tracker.register
+
+        def register_untracked_shm(name, rtype):
+            if rtype != 'shared_memory':
+                register(name, rtype)
+
+        resource_tracker.register = register_untracked_shm
+
+def _analyze_buffer(buffer, descriptor, symbol, timeframe):
+    df = frame_from_shared(buffer, descriptor)
+    precomputed = precomputed_series(df, descriptor['windows'])
+    analysis = _worker_indicators.analyze_all(df, symbol, timeframe, outputs=SIGNAL_OUTPUTS, precomputed=precomputed)
+    return _worker_indicators.collect_signals(df, analysis)
+
+def _attach(name):
+    """Gắn vào khối shared memory do tiến trình cha tạo (tiến trình cha sở hữu và unlink khối)"""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # Python < 3.13: _init_worker đã tắt việc đăng ký shared memory với resource_tracker
+    return shared_memory.SharedMemory(name=name)
+
+def analyze_shared(descriptor, symbol, timeframe):
+    """Chạy trong worker: phân tích dữ liệu trong shared memory, chỉ trả về các tín hiệu"""
+    shm = _attach(descriptor['name'])
+    try:
+        return _analyze_buffer(shm.buf, descriptor, symbol, timeframe)
+    except Exception as e:
+        # Traceback giữ biến cục bộ của các frame bên trong, trong đó có view tới buffer
+        traceback.clear_frames(e.__traceback__)
+        raise
+    finally:
+        # Cache đỉnh/đáy giữ view tới buffer và không dùng lại được sau khi khối bị xóa
+        _worker_indicators._swing_cache.clear()
+        try:
+            shm.close()
+        except BufferError:
+            # Còn view nằm trong vòng tham chiếu của pandas: thu gom rồi đóng lại
+            gc.collect()
+            shm.close()
+
+class SharedMemoryAnalysisPool:
+    """Process pool chạy analyze_all trên dữ liệu OHLCV đặt trong shared memory"""
+
+    def __init__(self, max_workers=None, swing_windows=(5, 20)):
+        # Worker được tạo dần khi bot đã có thread pool, luồng vẽ biểu đồ và event loop đang
+        # chạy: fork lúc đó có thể sao chép một khóa đang bị giữ (logging, matplotlib, sqlite)
+        # và treo worker, nên dùng forkserver (spawn nếu hệ điều hành không hỗ trợ)
+        start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        self.executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context(start_method),
+            initializer=_init_worker,
+            initargs=(swing_windows,)
+        )
+
+    async def analyze(self, loop, df, symbol, timeframe, precomputed=None):
+        """Gửi một DataFrame sang worker và chờ (advanced_signals, momentum_signals)"""
+        shared = SharedOHLCV(df, precomputed)
+        try:
+            return await loop.run_in_executor(self.executor, analyze_shared, shared.descriptor, symbol, timeframe)
+        finally:
+            shared.release()
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
@@ -0,0 +1,91 @@
+import numpy as np
+
+class SignalBatch:
+    """Lô bản ghi tín hiệu lưu theo cột thay cho danh sách dict.
+
+    Mỗi trường là một mảng (numpy hoặc pandas Index) cùng độ dài. Các trường
+    chuỗi lặp lại như 'type' hay 'direction' được lưu dưới dạng mã int8 trỏ vào
+    một bộ nhãn (tuple) dùng chung giữa các lô của cùng bộ phân tích. Trường có
+    thể thiếu giá trị thì đi kèm mặt nạ `nulls` (True = None khi đổi sang dict).
+
+    Duyệt (for/[]) vẫn trả về dict như định dạng cũ; to_dicts() đổi cả lô một lần.
+    """
+    __slots__ = ('fields', 'columns', 'labels', 'nulls')
+
+    def __init__(self, columns, labels=None, nulls=None):
+        self.fields = tuple(columns)
+        self.columns = columns
+        self.labels = labels or {}
+        self.nulls = nulls or {}
+
+    @classmethod
+    def from_records(cls, records, fields, labels=None):
+        """Dựng lô từ danh sách dict (dùng cho các kết quả nhỏ)"""
+        labels = labels or {}
+        columns = {}
+        for field in fields:
+            values = [record[field] for record in records]
+            if field in labels:
+                columns[field] = encode(values, labels[field])
+            else:
+                columns[field] = np.asarray(values) if values else np.empty(0)
+        return cls(columns, labels)
+
+    def __len__(self):
+        return len(self.columns[self.fields[0]]) if self.fields else 0
+
+    def __iter__(self):
+        return iter(self.to_dicts())
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        return {field: self._value(field, position) for field in self.fields}
+
+    def __repr__(self):
+        return f"SignalBatch({len(self)} bản ghi: {', '.join(self.fields)})"
+
+    def column(self, field):
+        """Giá trị của một trường cho cả lô (trường mã hóa được giải mã thành mảng nhãn)"""
+        values = self.columns[field]
+        if field in self.labels:
+            return np.asarray(self.labels[field], dtype=object)[values]
+        return values
+
+    def select(self, mask):
+        """Lô con gồm các bản ghi có mask True (giữ nguyên thứ tự)"""
+        columns = {field: values[mask] for field, values in self.columns.items()}
+        nulls = {field: missing[mask] for field, missing in self.nulls.items()}
+        return SignalBatch(columns, self.labels, nulls)
+
+    def to_dicts(self):
+        """Đổi sang định dạng cũ: danh sách dict, mỗi bản ghi một dict"""
+        values = {field: self.column(field).tolist() for field in self.fields}
+        for field, missing in self.nulls.items():
+            values[field] = [None if m else v for v, m in zip(values[field], missing.tolist())]
+        return [dict(zip(self.fields, row)) for row in zip(*(values[field] for field in self.fields))]
+
+    def _value(self, field, position):
+        if field in self.nulls and self.nulls[field][position]:
+            return None
+        value = self.columns[field][position]
+        if field in self.labels:
+            return self.labels[field][value]
+        return value.item() if isinstance(value, np.generic) else value
+
+def encode(values, labels):
+    """Mã hóa danh sách nhãn thành mảng mã int8 theo bộ nhãn cho trước"""
+    codes = {label: code for code, label in enumerate(labels)}
+    return np.array([codes[value] for value in values], dtype=np.int8)
+
+def to_dicts(value):
+    """Đổi mọi SignalBatch (kể cả lồng trong dict/list) sang danh sách dict"""
+    if isinstance(value, SignalBatch):
+        return value.to_dicts()
+    if isinstance(value, dict):
+        return {key: to_dicts(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [to_dicts(item) for item in value]
+    return value
@@ -1,99 +1,119 @@
 import pandas as pd
 import numpy as np
+from .swing_points import SwingPointIndex, rolling_max, rolling_min
+from .records import SignalBatch
+
+LEVEL_TYPES = ('support', 'resistance', 'pivot_low', 'pivot_high')
 
 class SupportResistanceAnalyzer:
     def __init__(self):
         self.levels = []
     
-    def find_levels(self, df, window=20):
-        """Tìm các mức hỗ trợ và kháng cự"""
-        levels = {
-            'support': [],
-            'resistance': [],
-            'dynamic': {
-                'support': [],
-                'resistance': []
-            }
-        }
+    def find_levels(self, df, window=20, swing_index=None, include_dynamic=True):
+        """Tìm các mức hỗ trợ và kháng cự (include_dynamic=False: bỏ qua các mức SMA động)"""
+        levels = {}
         
         # Tìm các mức cứng (Static Support/Resistance)
-        highs = df['high'].rolling(window=window).max()
-        lows = df['low'].rolling(window=window).min()
-        
-        # Lấy các đỉnh và đáy
-        peaks = highs[(highs.shift(1) < highs) & (highs.shift(-1) < highs)]
-        valleys = lows[(lows.shift(1) > lows) & (lows.shift(-1) > lows)]
+        if swing_index is None:
+            swing_index = SwingPointIndex(df, windows=(window,))
+        swings = swing_index.level(window)
         
-        # Thêm vào danh sách
-        for peak in peaks:
-            levels['resistance'].append({
-                'price': peak,
-                'type': 'resistance',
-                'strength': 0.7
-            })
+        # Tìm các mức pivot
+        pivots = self.find_pivots(df)
         
-        for valley in valleys:
-            levels['support'].append({
-                'price': valley,
-                'type': 'support',
-                'strength': 0.7
-            })
+        # Mức cứng: đỉnh/đáy theo cửa sổ trước, sau đó đến các pivot
+        levels['support'] = self._level_batch([
+            (swings.valley_prices, 'support', 0.7),
+            (pivots['lows']['price'], 'pivot_low', 0.8)
+        ])
+        levels['resistance'] = self._level_batch([
+            (swings.peak_prices, 'resistance', 0.7),
+            (pivots['highs']['price'], 'pivot_high', 0.8)
+        ])
         
         # Tìm các mức động (Dynamic Support/Resistance)
-        sma_20 = df['close'].rolling(window=20).mean()
-        sma_50 = df['close'].rolling(window=50).mean()
-        
-        # Mức động là các SMA
-        levels['dynamic']['support'].append({
-            'price': sma_20.iloc[-1],
-            'type': 'sma_20',
-            'strength': 0.5
-        })
-        
-        levels['dynamic']['support'].append({
-            'price': sma_50.iloc[-1],
-            'type': 'sma_50',
-            'strength': 0.6
-        })
-        
-        # Tìm các mức pivot
-        pivot_highs = self.find_pivot_highs(df)
-        pivot_lows = self.find_pivot_lows(df)
-        
-        for pivot in pivot_highs:
-            levels['resistance'].append({
-                'price': pivot,
-                'type': 'pivot_high',
-                'strength': 0.8
+        if include_dynamic:
+            levels['dynamic'] = {
+                'support': [],
+                'resistance': []
+            }
+            
+            sma_20 = df['close'].rolling(window=20).mean()
+            sma_50 = df['close'].rolling(window=50).mean()
+            
+            # Mức động là các SMA
+            levels['dynamic']['support'].append({
+                'price': sma_20.iloc[-1],
+                'type': 'sma_20',
+                'strength': 0.5
             })
-        
-        for pivot in pivot_lows:
-            levels['support'].append({
-                'price': pivot,
-                'type': 'pivot_low',
-                'strength': 0.8
+            
+            levels['dynamic']['support'].append({
+                'price': sma_50.iloc[-1],
+                'type': 'sma_50',
+                'strength': 0.6
             })
         
         return levels
     
+    @staticmethod
+    def _level_batch(groups):
+        """Gộp các nhóm (giá, loại mức, độ mạnh) thành một lô bản ghi dạng cột"""
+        prices = np.concatenate([np.asarray(group_prices, dtype=float) for group_prices, _, _ in groups])
+        types = np.concatenate([
+            np.full(len(group_prices), LEVEL_TYPES.index(level_type), dtype=np.int8)
+            for group_prices, level_type, _ in groups
+        ])
+        strengths = np.concatenate([np.full(len(group_prices), strength) for group_prices, _, strength in groups])
+        return SignalBatch({'price': prices, 'type': types, 'strength': strengths}, labels={'type': LEVEL_TYPES})
+    
+    def find_pivots(self, df, window=5):
+        """Tìm các đỉnh và đáy pivot trong một lần duyệt vector hóa"""
+        high = df['high'].to_numpy(dtype=float)
+        low = df['low'].to_numpy(dtype=float)
+        
+        return {
+            'highs': self._pivot_points(df, high, window, is_high=True),
+            'lows': self._pivot_points(df, low, window, is_high=False)
+        }
+    
     def find_pivot_highs(self, df, window=5):
         """Tìm các đỉnh pivot"""
-        pivot_highs = []
-        
-        for i in range(window, len(df) - window):
-            if (df.iloc[i]['high'] > df.iloc[i-window:i]['high'].max() and
-                df.iloc[i]['high'] > df.iloc[i+1:i+window+1]['high'].max()):
-                pivot_highs.append(df.iloc[i]['high'])
-        
-        return pivot_highs
+        high = df['high'].to_numpy(dtype=float)
+        return self._pivot_points(df, high, window, is_high=True)['price'].tolist()
     
     def find_pivot_lows(self, df, window=5):
         """Tìm các đáy pivot"""
-        pivot_lows = []
+        low = df['low'].to_numpy(dtype=float)
+        return self._pivot_points(df, low, window, is_high=False)['price'].tolist()
+    
+    def _pivot_points(self, df, values, window, is_high):
+        """Nến i là pivot nếu vượt hẳn `window` nến bên trái và `window` nến bên phải"""
+        n = len(values)
+        positions = np.arange(window, max(window, n - window))
         
-        for i in range(window, len(df) - window):
-            if (df.iloc[i]['low'] < df.iloc[i-window:i]['low'].min() and
-                df.iloc[i]['low'] < df.iloc[i+1:i+window+1]['low'].min()):
-                pivot_lows.append(df.iloc[i]['low'])
+        if len(positions) > 0:
+            # Bỏ qua NaN khi lấy max/min của cửa sổ (giống Series.max()/min())
+            missing = np.isnan(values)
+            if is_high:
+                extreme = rolling_max(np.where(missing, -np.inf, values), window)
+            else:
+                extreme = rolling_min(np.where(missing, np.inf, values), window)
+            extreme[rolling_min(missing.astype(float), window) == 1] = np.nan
+            
+            # Cửa sổ bên trái [i-window, i) kết thúc tại i-1, bên phải [i+1, i+window] kết thúc tại i+window
+            left = extreme[positions - 1]
+            right = extreme[positions + window]
+            current = values[positions]
+            
+            if is_high:
+                is_pivot = (current > left) & (current > right)
+            else:
+                is_pivot = (current < left) & (current < right)
+            positions = positions[is_pivot]
         
-        return pivot_lows
\ No newline at end of file
+        return {
+            'index': positions,
+            'time': df.index[positions],
+            'price': values[positions]
+        }
\ No newline at end of file
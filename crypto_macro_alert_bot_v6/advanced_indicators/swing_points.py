@@ -0,0 +1,71 @@
+import pandas as pd
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+def rolling_max(values, window):
+    """Giá trị lớn nhất trượt, tương đương Series.rolling(window).max()"""
+    result = np.full(len(values), np.nan)
+    if len(values) >= window:
+        result[window - 1:] = sliding_window_view(values, window).max(axis=1)
+    return result
+
+def rolling_min(values, window):
+    """Giá trị nhỏ nhất trượt, tương đương Series.rolling(window).min()"""
+    result = np.full(len(values), np.nan)
+    if len(values) >= window:
+        result[window - 1:] = sliding_window_view(values, window).min(axis=1)
+    return result
+
+class SwingLevel:
+    """Các đỉnh/đáy của một kích thước cửa sổ, lưu dưới dạng mảng vị trí và giá"""
+
+    def __init__(self, high, low, window):
+        self.window = window
+        self.rolling_high = rolling_max(high, window)
+        self.rolling_low = rolling_min(low, window)
+
+        # Đỉnh: giá trị rolling max lớn hơn hai giá trị kề bên
+        peaks = self._local_extrema(self.rolling_high, np.greater)
+        self.peak_positions = np.flatnonzero(peaks)
+        self.peak_prices = self.rolling_high[self.peak_positions]
+
+        # Đáy: giá trị rolling min nhỏ hơn hai giá trị kề bên
+        valleys = self._local_extrema(self.rolling_low, np.less)
+        self.valley_positions = np.flatnonzero(valleys)
+        self.valley_prices = self.rolling_low[self.valley_positions]
+
+        # Trung bình của rolling max/min (dùng làm đường cổ/kháng cự của mẫu hình)
+        self.rolling_high_mean = self._nanmean(self.rolling_high)
+        self.rolling_low_mean = self._nanmean(self.rolling_low)
+
+    @staticmethod
+    def _nanmean(values):
+        valid = values[~np.isnan(values)]
+        return valid.mean() if valid.size else np.nan
+
+    @staticmethod
+    def _local_extrema(values, compare):
+        previous = np.empty_like(values)
+        previous[:1] = np.nan
+        previous[1:] = values[:-1]
+        following = np.empty_like(values)
+        following[-1:] = np.nan
+        following[:-1] = values[1:]
+        return compare(values, previous) & compare(values, following)
+
+class SwingPointIndex:
+    """Chỉ mục đỉnh/đáy dùng chung cho các bộ phân tích trên cùng một DataFrame"""
+
+    def __init__(self, df, windows=(5, 20)):
+        self.high = df['high'].to_numpy(dtype=float)
+        self.low = df['low'].to_numpy(dtype=float)
+        self.levels = {}
+
+        for window in windows:
+            self.level(window)
+
+    def level(self, window):
+        """Lấy các đỉnh/đáy cho một cửa sổ, tính khi được yêu cầu lần đầu"""
+        if window not in self.levels:
+            self.levels[window] = SwingLevel(self.high, self.low, window)
+        return self.levels[window]
@@ -1,11 +1,17 @@
 import pandas as pd
 import numpy as np
+from .swing_points import SwingPointIndex
+from .records import SignalBatch
+
+TRENDLINE_FIELDS = ('start_price', 'end_price', 'slope', 'strength')
+HORIZONTAL_FIELDS = ('price', 'type', 'strength')
+HORIZONTAL_TYPES = ('support', 'resistance')
 
 class TrendlineAnalyzer:
     def __init__(self):
         self.trendlines = []
     
-    def draw_trendlines(self, df):
+    def draw_trendlines(self, df, swing_index=None):
         """Vẽ các đường xu hướng"""
         trendlines = {
             'uptrend': [],
@@ -14,16 +20,17 @@ class TrendlineAnalyzer:
         }
         
         # Tìm các đỉnh và đáy
-        highs = df['high'].rolling(window=5).max()
-        lows = df['low'].rolling(window=5).min()
-        peaks = highs[(highs.shift(1) < highs) & (highs.shift(-1) < highs)]
-        valleys = lows[(lows.shift(1) > lows) & (lows.shift(-1) > lows)]
+        if swing_index is None:
+            swing_index = SwingPointIndex(df, windows=(5,))
+        swings = swing_index.level(5)
+        peaks = swings.peak_prices
+        valleys = swings.valley_prices
         
         # Vẽ đường xu hướng tăng
         if len(valleys) >= 2:
             # Lấy 2 đáy gần nhất để vẽ đường
-            valley1 = valleys.iloc[-2]
-            valley2 = valleys.iloc[-1]
+            valley1 = valleys[-2]
+            valley2 = valleys[-1]
             
             # Tính toán độ dốc
             slope = (valley2 - valley1) / 2
@@ -39,8 +46,8 @@ class TrendlineAnalyzer:
         # Vẽ đường xu hướng giảm
         if len(peaks) >= 2:
             # Lấy 2 đỉnh gần nhất để vẽ đường
-            peak1 = peaks.iloc[-2]
-            peak2 = peaks.iloc[-1]
+            peak1 = peaks[-2]
+            peak2 = peaks[-1]
             
             # Tính toán độ dốc
             slope = (peak2 - peak1) / 2
@@ -73,4 +80,10 @@ class TrendlineAnalyzer:
                     'strength': 0.6
                 })
         
-        return trendlines
\ No newline at end of file
+        return {
+            'uptrend': SignalBatch.from_records(trendlines['uptrend'], TRENDLINE_FIELDS),
+            'downtrend': SignalBatch.from_records(trendlines['downtrend'], TRENDLINE_FIELDS),
+            'horizontal': SignalBatch.from_records(
+                trendlines['horizontal'], HORIZONTAL_FIELDS, labels={'type': HORIZONTAL_TYPES}
+            )
+        }
\ No newline at end of file
@@ -2,54 +2,165 @@ import pandas as pd
 import numpy as np
 
 class VolumeAnalyzer:
-    def __init__(self):
+    def __init__(self, profile_bins=19, distribute_volume=False, value_area_ratio=0.7):
         self.volume_signals = []
+        self.profile_bins = profile_bins
+        self.distribute_volume = distribute_volume
+        self.value_area_ratio = value_area_ratio
     
-    def analyze_volume(self, df):
-        """Phân tích khối lượng giao dịch"""
-        volume_analysis = {
-            'volume_profile': self.calculate_volume_profile(df),
-            'obv': self.calculate_obv(df),
-            'volume_sma': self.calculate_volume_sma(df),
-            'volume_signals': self.identify_volume_signals(df)
-        }
+    def analyze_volume(self, df, include=None):
+        """Phân tích khối lượng giao dịch (include: chỉ tính các khóa kết quả được yêu cầu)"""
+        def wanted(key):
+            return include is None or key in include
+        
+        volume_analysis = {}
+        
+        if wanted('volume_profile') or wanted('point_of_control') or wanted('value_area'):
+            profile = self.build_volume_profile(df)
+            if wanted('volume_profile'):
+                volume_analysis['volume_profile'] = self.format_volume_profile(df, profile)
+            if wanted('point_of_control'):
+                volume_analysis['point_of_control'] = profile['poc_price']
+            if wanted('value_area'):
+                volume_analysis['value_area'] = {
+                    'low': profile['value_area_low'],
+                    'high': profile['value_area_high']
+                }
+        
+        # OBV và SMA khối lượng chỉ tính một lần, dùng lại cho phần nhận diện tín hiệu
+        if wanted('obv') or wanted('volume_sma') or wanted('volume_signals'):
+            obv = self.calculate_obv(df)
+            volume_sma = self.calculate_volume_sma(df)
+            if wanted('obv'):
+                volume_analysis['obv'] = obv
+            if wanted('volume_sma'):
+                volume_analysis['volume_sma'] = volume_sma
+            if wanted('volume_signals'):
+                volume_analysis['volume_signals'] = self.identify_volume_signals(df, obv=obv, volume_sma=volume_sma)
         
         return volume_analysis
     
-    def calculate_volume_profile(self, df):
+    def calculate_volume_profile(self, df, bins=None, distribute=None):
         """Tính toán Volume Profile"""
-        # Chia giá thành các mức
-        price_range = df['high'].max() - df['low'].min()
-        price_levels = np.linspace(df['low'].min(), df['high'].max(), 20)
+        profile = self.build_volume_profile(df, bins=bins, distribute=distribute)
+        return self.format_volume_profile(df, profile)
+    
+    def format_volume_profile(self, df, profile):
+        """Chuyển kết quả histogram thành danh sách các mức giá"""
+        edges = profile['edges']
+        volumes = profile['volumes']
+        high_volume = volumes > np.nanmean(df['volume'].to_numpy(dtype=float)) * 1.5
         
-        # Tính toán khối lượng tại mỗi mức giá
         volume_profile = []
-        for i in range(len(price_levels) - 1):
-            lower = price_levels[i]
-            upper = price_levels[i + 1]
-            
-            # Tổng khối lượng trong khoảng giá
-            volume = df[(df['close'] >= lower) & (df['close'] < upper)]['volume'].sum()
-            
+        for lower, upper, volume, is_high in zip(edges[:-1].tolist(), edges[1:].tolist(), volumes.tolist(), high_volume.tolist()):
             volume_profile.append({
                 'price_range': f"{lower:.2f}-{upper:.2f}",
                 'volume': volume,
-                'high_volume': volume > df['volume'].mean() * 1.5
+                'high_volume': is_high
             })
         
         return volume_profile
     
+    def build_volume_profile(self, df, bins=None, distribute=None):
+        """Tính Volume Profile bằng histogram, kèm Point of Control và Value Area.
+        
+        distribute=True rải đều khối lượng của mỗi nến trên biên độ high-low
+        thay vì dồn toàn bộ vào giá đóng cửa.
+        """
+        bins = self.profile_bins if bins is None else bins
+        distribute = self.distribute_volume if distribute is None else distribute
+        
+        high = df['high'].to_numpy(dtype=float)
+        low = df['low'].to_numpy(dtype=float)
+        close = df['close'].to_numpy(dtype=float)
+        volume = df['volume'].to_numpy(dtype=float)
+        
+        # Chia giá thành các mức
+        price_low = np.nanmin(low) if len(low) else np.nan
+        price_high = np.nanmax(high) if len(high) else np.nan
+        edges = np.linspace(price_low, price_high, bins + 1)
+        
+        if not price_high > price_low:
+            volumes = np.zeros(bins)
+        elif distribute:
+            valid = ~(np.isnan(high) | np.isnan(low) | np.isnan(close) | np.isnan(volume))
+            volumes = self._distributed_histogram(high[valid], low[valid], close[valid], volume[valid], edges)
+        else:
+            valid = ~(np.isnan(close) | np.isnan(volume))
+            volumes = np.histogram(close[valid], bins=edges, weights=volume[valid])[0]
+        
+        profile = {
+            'edges': edges,
+            'volumes': volumes,
+            'poc_price': np.nan,
+            'value_area_low': np.nan,
+            'value_area_high': np.nan
+        }
+        
+        if volumes.sum() > 0:
+            poc, first, last = self._value_area(volumes)
+            profile['poc_price'] = (edges[poc] + edges[poc + 1]) / 2
+            profile['value_area_low'] = edges[first]
+            profile['value_area_high'] = edges[last + 1]
+        
+        return profile
+    
+    def _distributed_histogram(self, high, low, close, volume, edges):
+        """Phân bổ khối lượng mỗi nến đều trên [low, high] và cộng dồn theo từng mức giá"""
+        spread = high - low
+        ranged = spread > 0
+        
+        # Nến không có biên độ: dồn toàn bộ khối lượng vào giá đóng cửa
+        volumes = np.histogram(close[~ranged], bins=edges, weights=volume[~ranged])[0]
+        
+        # Khối lượng tích lũy tới mức giá x: sum(d_i * (min(x, high_i) - low_i)) với low_i < x
+        density = volume[ranged] / spread[ranged]
+        cumulative = (self._ramp_sum(low[ranged], density, edges)
+                      - self._ramp_sum(high[ranged], density, edges))
+        
+        return volumes + np.diff(cumulative)
+    
+    @staticmethod
+    def _ramp_sum(starts, density, points):
+        """Tính sum(density_i * max(0, x - start_i)) tại mỗi điểm x bằng tổng tích lũy"""
+        order = np.argsort(starts)
+        starts = starts[order]
+        density = density[order]
+        cum_density = np.concatenate(([0.0], np.cumsum(density)))
+        cum_weighted = np.concatenate(([0.0], np.cumsum(density * starts)))
+        
+        count = np.searchsorted(starts, points, side='right')
+        return points * cum_density[count] - cum_weighted[count]
+    
+    def _value_area(self, volumes):
+        """Mở rộng từ POC sang phía có khối lượng lớn hơn cho đến khi đạt tỷ lệ Value Area"""
+        poc = int(np.argmax(volumes))
+        target = volumes.sum() * self.value_area_ratio
+        first = last = poc
+        area_volume = volumes[poc]
+        
+        while area_volume < target and (first > 0 or last < len(volumes) - 1):
+            below = volumes[first - 1] if first > 0 else -1.0
+            above = volumes[last + 1] if last < len(volumes) - 1 else -1.0
+            if above >= below:
+                last += 1
+                area_volume += above
+            else:
+                first -= 1
+                area_volume += below
+        
+        return poc, first, last
+    
     def calculate_obv(self, df):
         """Tính toán On-Balance Volume (OBV)"""
-        obv = np.zeros(len(df))
+        close = df['close'].to_numpy(dtype=float)
+        volume = df['volume'].to_numpy(dtype=float)
         
-        for i in range(1, len(df)):
-            if df['close'].iloc[i] > df['close'].iloc[i-1]:
-                obv[i] = obv[i-1] + df['volume'].iloc[i]
-            elif df['close'].iloc[i] < df['close'].iloc[i-1]:
-                obv[i] = obv[i-1] - df['volume'].iloc[i]
-            else:
-                obv[i] = obv[i-1]
+        # Hướng giá so với nến trước: +1 tăng, -1 giảm, 0 đứng yên (nến đầu tiên = 0)
+        direction = np.sign(np.diff(close, prepend=np.nan))
+        direction[np.isnan(direction)] = 0
+        
+        obv = np.cumsum(np.where(direction != 0, direction * volume, 0.0))
         
         return pd.Series(obv, index=df.index)
     
@@ -66,25 +177,39 @@ class VolumeAnalyzer:
             'current_sma_50': volume_sma_50.iloc[-1]
         }
     
-    def identify_volume_signals(self, df):
+    def identify_volume_signal_series(self, df, obv=None, volume_sma=None):
+        """Tính các tín hiệu khối lượng dưới dạng chuỗi boolean cho toàn bộ lịch sử"""
+        if obv is None:
+            obv = self.calculate_obv(df)
+        if volume_sma is None:
+            volume_sma = self.calculate_volume_sma(df)
+        
+        # So sánh xu hướng giá và OBV với nến trước đó
+        price_up = df['close'] > df['close'].shift(1)
+        obv_up = obv > obv.shift(1)
+        
+        return {
+            'price_up': price_up,
+            'bearish_divergence': price_up & ~obv_up,
+            'bullish_divergence': ~price_up & obv_up,
+            'volume_breakout': df['volume'] > volume_sma['sma_20'] * 2
+        }
+    
+    def identify_volume_signals(self, df, obv=None, volume_sma=None):
         """Nhận diện tín hiệu từ khối lượng"""
         signals = []
         
-        # Tính toán OBV
-        obv = self.calculate_obv(df)
-        
-        # So sánh giá và OBV
-        price_trend = df['close'].iloc[-1] > df['close'].iloc[-2]
-        obv_trend = obv.iloc[-1] > obv.iloc[-2]
+        series = self.identify_volume_signal_series(df, obv=obv, volume_sma=volume_sma)
+        price_trend = series['price_up'].iloc[-1]
         
-        if price_trend and not obv_trend:
+        if series['bearish_divergence'].iloc[-1]:
             signals.append({
                 'type': 'Divergence',
                 'message': 'Giá tăng nhưng OBV giảm - Divergence giảm giá',
                 'strength': 0.8,
                 'direction': 'bearish'
             })
-        elif not price_trend and obv_trend:
+        elif series['bullish_divergence'].iloc[-1]:
             signals.append({
                 'type': 'Divergence',
                 'message': 'Giá giảm nhưng OBV tăng - Divergence tăng giá',
@@ -93,10 +218,7 @@ class VolumeAnalyzer:
             })
         
         # Kiểm tra volume breakout
-        volume_sma_20 = df['volume'].rolling(window=20).mean()
-        current_volume = df['volume'].iloc[-1]
-        
-        if current_volume > volume_sma_20.iloc[-1] * 2:
+        if series['volume_breakout'].iloc[-1]:
             signals.append({
                 'type': 'Volume Breakout',
                 'message': 'Khối lượng tăng đột biến',
@@ -0,0 +1,428 @@
+"""Backtest các tín hiệu cảnh báo trên dữ liệu OHLCV lịch sử.
+
+Mô phỏng bot chạy sau mỗi nến đóng, mỗi lần nhìn cửa sổ KLINES_LIMIT nến gần nhất,
+rồi thống kê số lần xuất hiện và tỷ lệ đúng hướng của lợi nhuận sau N nến cho từng
+loại tín hiệu (tín hiệu nâng cao của collect_signals và khối RSI của main).
+
+Không gọi analyze_all cho từng nến: mỗi bộ phân tích được tính một lần trên toàn
+bộ lịch sử bằng các phép toán vector, sau đó lấy đúng phần mà cửa sổ kết thúc tại
+nến t nhìn thấy (các đỉnh/đáy, pivot, FVG nằm trong cửa sổ), nên chi phí là O(n)
+theo số nến thay vì O(n * cửa sổ).
+
+    python backtest.py data/BTCUSDT_1h.csv --horizons 1 4 12 24
+    python backtest.py data/*.csv --output backtest_results.json
+
+File CSV cần các cột open, high, low, close, volume và một cột thời gian
+(open_time/timestamp/time/date, dạng mili giây hoặc chuỗi ngày giờ). Tên file dạng
+SYMBOL_TIMEFRAME.csv cho biết cặp tiền (dùng cấu hình RSI của cặp) và khung thời gian.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Thêm thư mục gốc của bot vào sys.path (giống main.py)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from advanced_indicators import AdvancedIndicators
+from advanced_indicators.swing_points import SwingPointIndex, rolling_max, rolling_min
+from utils.config import Config
+from utils.ohlcv_cache import OHLCV_COLUMNS
+
+DEFAULT_HORIZONS = [1, 4, 12, 24]
+TIME_COLUMNS = ('open_time', 'timestamp', 'time', 'date', 'datetime')
+
+# Hướng kỳ vọng của tín hiệu: 1 tăng, -1 giảm, 0 không có hướng
+BULLISH, BEARISH, NEUTRAL = 1, -1, 0
+DIRECTION_LABELS = {BULLISH: 'bullish', BEARISH: 'bearish', NEUTRAL: 'neutral'}
+
+# Mặt nạ của CandlestickPatternRecognizer.compute_masks -> (tên mẫu nến, hướng)
+CANDLESTICK_SIGNALS = {
+    'doji': ('Doji', NEUTRAL),
+    'hammer': ('Hammer', BULLISH),
+    'shooting_star': ('Shooting Star', BEARISH),
+    'bullish_engulfing': ('Bullish Engulfing', BULLISH),
+    'bearish_engulfing': ('Bearish Engulfing', BEARISH),
+    'bullish_harami': ('Bullish Harami', BULLISH),
+    'bearish_harami': ('Bearish Harami', BEARISH)
+}
+
+# Khoảng cách tối đa tới mức giá (Fibonacci, hỗ trợ/kháng cự) giống collect_signals
+LEVEL_PROXIMITY = 0.02
+
+def load_ohlcv(path):
+    """Đọc nến OHLCV từ CSV, index là thời gian mở nến (nếu có cột thời gian)"""
+    df = pd.read_csv(path)
+    df.columns = [str(column).strip().lower() for column in df.columns]
+
+    missing = [column for column in OHLCV_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"{path}: thiếu cột {', '.join(missing)}")
+
+    time_column = next((column for column in TIME_COLUMNS if column in df.columns), None)
+    if time_column is not None:
+        times = df[time_column]
+        if pd.api.types.is_numeric_dtype(times):
+            df.index = pd.to_datetime(times, unit='ms')
+        else:
+            df.index = pd.to_datetime(times)
+        df.index.name = 'open_time'
+        df = df.sort_index()
+
+    return df[list(OHLCV_COLUMNS)].astype(float)
+
+def parse_file_name(path):
+    """(symbol, timeframe) từ tên file dạng SYMBOL_TIMEFRAME.csv"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    symbol, _, timeframe = stem.partition('_')
+    return symbol.upper(), timeframe or None
+
+def forward_returns(close, horizons):
+    """Lợi nhuận từ giá đóng cửa nến t tới nến t + h (NaN khi không đủ dữ liệu)"""
+    returns = {}
+    for horizon in horizons:
+        values = np.full(len(close), np.nan)
+        if len(close) > horizon:
+            values[:-horizon] = close[horizon:] / close[:-horizon] - 1
+        returns[horizon] = values
+    return returns
+
+def visible_range(positions, first, last):
+    """Khoảng chỉ số [lo, hi) của các vị trí (đã sắp xếp) nằm trong [first, last] cho mỗi nến"""
+    return np.searchsorted(positions, first, side='left'), np.searchsorted(positions, last, side='right')
+
+def any_level_near(prices, lo, hi, close, proximity=LEVEL_PROXIMITY):
+    """Có mức giá nào trong prices[lo:hi] cách giá đóng cửa dưới `proximity` hay không.
+
+    Số mức nằm trong một cửa sổ nhỏ nên duyệt theo thứ tự trong cửa sổ, mỗi bước
+    là một phép toán vector trên toàn bộ các nến.
+    """
+    near = np.zeros(len(close), dtype=bool)
+    if len(prices) == 0:
+        return near
+    with np.errstate(invalid='ignore'):
+        for offset in range(int((hi - lo).max(initial=0))):
+            position = lo + offset
+            present = position < hi
+            price = prices[np.minimum(position, len(prices) - 1)]
+            near |= present & (np.abs(close - price) / close < proximity)
+    return near
+
+class SignalBacktester:
+    """Tính tín hiệu của từng nến như khi bot chạy với cửa sổ `window` nến kết thúc tại nến đó.
+
+    Tín hiệu được tính trên nến đã đóng và được đếm ở nến đầu tiên nó xuất hiện
+    (giống kho chống gửi lặp: cảnh báo chỉ gửi lại sau khi tín hiệu biến mất).
+    Mẫu nến được tính tại nến hình thành mẫu; Triangle/Wedge không được đưa vào
+    vì polyfit trên chuỗi rolling có NaN ở đầu nên hai mẫu này không bao giờ được
+    phát hiện trong analyze_all.
+    """
+
+    def __init__(self, window=Config.KLINES_LIMIT, horizons=DEFAULT_HORIZONS, indicators=None):
+        self.window = window
+        self.horizons = list(horizons)
+        self.indicators = indicators or AdvancedIndicators()
+
+    def signal_masks(self, df, symbol=None):
+        """{tên tín hiệu: (mặt nạ boolean theo nến, hướng)} cho toàn bộ lịch sử"""
+        indicators = self.indicators
+        close = df['close'].to_numpy(dtype=float)
+        n = len(df)
+        ends = np.arange(n)
+        # Nến đầu tiên của cửa sổ kết thúc tại mỗi nến
+        starts = ends - self.window + 1
+        masks = {}
+
+        # Khối RSI của main (ngưỡng theo cặp tiền) và tín hiệu động lượng của collect_signals
+        series = indicators.momentum.compute_series(df, include={'rsi', 'macd'})
+        rsi = series['rsi']
+        symbol_config = Config.SYMBOL_CONFIGS.get(symbol, Config.SYMBOL_CONFIGS['DEFAULT'])
+        rsi_oversold = symbol_config.get('rsi_oversold', Config.RSI_OVERSOLD_THRESHOLD)
+        rsi_overbought = symbol_config.get('rsi_overbought', Config.RSI_OVERBOUGHT_THRESHOLD)
+        with np.errstate(invalid='ignore'):
+            masks['Alert RSI Oversold'] = (rsi < rsi_oversold, BULLISH)
+            masks['Alert RSI Overbought'] = (rsi > rsi_overbought, BEARISH)
+            masks['RSI Overbought'] = (rsi > 70, BEARISH)
+            masks['RSI Oversold'] = (rsi < 30, BULLISH)
+            masks['MACD Bullish'] = (series['macd_hist'] > 0, BULLISH)
+            masks['MACD Bearish'] = (series['macd_hist'] < 0, BEARISH)
+
+        # Fibonacci: đỉnh/đáy 20 nến gần nhất
+        recent_high = rolling_max(df['high'].to_numpy(dtype=float), 20)
+        recent_low = rolling_min(df['low'].to_numpy(dtype=float), 20)
+        near_fibonacci = np.zeros(n, dtype=bool)
+        with np.errstate(invalid='ignore'):
+            for ratio in indicators.fibonacci.fib_levels.values():
+                price = recent_high - (recent_high - recent_low) * ratio
+                near_fibonacci |= np.abs(close - price) / close < LEVEL_PROXIMITY
+        masks['Fibonacci'] = (near_fibonacci, NEUTRAL)
+
+        # Đỉnh/đáy nằm trong cửa sổ: vị trí p với start + w <= p <= t - 1 (xem SwingLevel)
+        swing_index = SwingPointIndex(df, windows=indicators.swing_windows)
+        swings = swing_index.level(5)
+        peak_lo, peak_hi = visible_range(swings.peak_positions, starts + 5, ends - 1)
+        valley_lo, valley_hi = visible_range(swings.valley_positions, starts + 5, ends - 1)
+        peak_count = peak_hi - peak_lo
+        valley_count = valley_hi - valley_lo
+        peaks = self._last_values(swings.peak_prices, peak_hi, 3)
+        valleys = self._last_values(swings.valley_prices, valley_hi, 2)
+
+        # Mẫu hình giống PatternRecognizer: 2-3 đỉnh/đáy gần nhất trong cửa sổ
+        with np.errstate(invalid='ignore'):
+            head_and_shoulders = (
+                (peak_count >= 3) & (peaks[0] < peaks[1]) & (peaks[1] > peaks[2])
+                & (np.abs(peaks[0] - peaks[2]) < 0.1 * peaks[1])
+            )
+            double_top = (peak_count >= 2) & (np.abs(peaks[1] - peaks[2]) < 0.05 * peaks[1])
+            double_bottom = (valley_count >= 2) & (np.abs(valleys[0] - valleys[1]) < 0.05 * valleys[0])
+        masks['Head and Shoulders'] = (head_and_shoulders, BEARISH)
+        masks['Double Top'] = (double_top, BEARISH)
+        masks['Double Bottom'] = (double_bottom, BULLISH)
+        masks['Elliott Wave'] = ((peak_count >= 3) & (valley_count >= 3), NEUTRAL)
+        masks['Uptrend'] = (valley_count >= 2, BULLISH)
+        masks['Downtrend'] = (peak_count >= 2, BEARISH)
+
+        # Hỗ trợ/kháng cự: đỉnh/đáy cửa sổ 20 và pivot 5 nến (start + 5 <= p <= t - 5)
+        levels = swing_index.level(20)
+        pivots = indicators.support_resistance.find_pivots(df)
+        for name, direction, swing_positions, swing_prices, pivot in (
+            ('Support', BULLISH, levels.valley_positions, levels.valley_prices, pivots['lows']),
+            ('Resistance', BEARISH, levels.peak_positions, levels.peak_prices, pivots['highs'])
+        ):
+            near = any_level_near(swing_prices, *visible_range(swing_positions, starts + 20, ends - 1), close)
+            near |= any_level_near(pivot['price'], *visible_range(pivot['index'], starts + 5, ends - 5), close)
+            masks[name] = (near, direction)
+
+        # FVG còn mở gần giá
+        fvg_bullish, fvg_bearish = self._fvg_masks(df, close)
+        masks['FVG bullish'] = (fvg_bullish, BULLISH)
+        masks['FVG bearish'] = (fvg_bearish, BEARISH)
+
+        # Mẫu nến tại nến hình thành mẫu
+        for key, mask in indicators.candlestick.compute_masks(df).items():
+            name, direction = CANDLESTICK_SIGNALS[key]
+            masks[f"Candlestick {name}"] = (mask, direction)
+
+        # Tín hiệu khối lượng (chỉ phụ thuộc nến hiện tại, nến trước và SMA 20)
+        volume = indicators.volume.identify_volume_signal_series(df)
+        price_up = volume['price_up'].to_numpy()
+        breakout = volume['volume_breakout'].to_numpy()
+        masks['Divergence bearish'] = (volume['bearish_divergence'].to_numpy(), BEARISH)
+        masks['Divergence bullish'] = (volume['bullish_divergence'].to_numpy(), BULLISH)
+        masks['Volume Breakout bullish'] = (breakout & price_up, BULLISH)
+        masks['Volume Breakout bearish'] = (breakout & ~price_up, BEARISH)
+
+        # Bot chỉ phân tích khi có đủ `window` nến
+        eligible = ends >= self.window - 1
+        return {name: (mask & eligible, direction) for name, (mask, direction) in masks.items()}
+
+    def run(self, df, symbol=None, timeframe=None):
+        """Thống kê tín hiệu của một chuỗi nến (dạng cộng dồn được, xem summarize)"""
+        close = df['close'].to_numpy(dtype=float)
+        returns = forward_returns(close, self.horizons)
+        masks = self.signal_masks(df, symbol)
+
+        tallies = {}
+        for name, (mask, direction) in masks.items():
+            # Chỉ tính nến đầu tiên của mỗi đợt tín hiệu
+            onsets = mask & ~np.r_[False, mask[:-1]]
+            tallies[name] = {
+                'direction': direction,
+                'occurrences': int(onsets.sum()),
+                'active_bars': int(mask.sum()),
+                'horizons': {horizon: self._tally(values[onsets], direction) for horizon, values in returns.items()}
+            }
+
+        # Mức nền: mọi nến có đủ cửa sổ, dùng để so sánh tỷ lệ đúng hướng
+        eligible = np.arange(len(close)) >= self.window - 1
+        baseline = {horizon: self._tally(values[eligible], BULLISH) for horizon, values in returns.items()}
+        return {'symbol': symbol, 'timeframe': timeframe, 'bars': len(df), 'signals': tallies, 'baseline': baseline}
+
+    @staticmethod
+    def _tally(values, direction):
+        values = values[~np.isnan(values)]
+        return {
+            'n': int(len(values)),
+            'sum_return': float(values.sum()),
+            'hits': int((np.sign(values) == direction).sum()) if direction != NEUTRAL else 0
+        }
+
+    @staticmethod
+    def _last_values(prices, hi, count):
+        """count giá cuối cùng trước vị trí hi cho mỗi nến (NaN nếu không có)"""
+        padded = np.concatenate((np.full(count, np.nan), prices))
+        return [padded[hi + offset] for offset in range(count)]
+
+    def _fvg_masks(self, df, close):
+        """FVG còn mở trong cửa sổ và đủ gần giá đóng cửa, theo hướng tăng/giảm.
+
+        Gap ở vị trí p xuất hiện trong cửa sổ kết thúc tại t khi p + 2 <= t <= p + window - 2,
+        và còn mở nếu chưa bị lấp trước hoặc tại t. Với mỗi nến giữ giá end_price gần
+        nhất của các gap còn mở (lớn nhất với gap tăng, nhỏ nhất với gap giảm).
+        """
+        n = len(close)
+        fvg = self.indicators.fvg.calculate_fvg(df)
+        positions = fvg.columns['index']
+        end_price = fvg.columns['end_price']
+        bullish = fvg.column('direction') == 'bullish'
+        mitigated = np.where(fvg.column('status') == 'filled', fvg.columns['mitigated_index'], n)
+        last_visible = np.minimum(positions + self.window - 2, mitigated - 1)
+
+        highest = np.full(n, -np.inf)
+        lowest = np.full(n, np.inf)
+        for is_bullish, best, combine in ((True, highest, np.maximum), (False, lowest, np.minimum)):
+            selected = bullish == is_bullish
+            first, last, prices = positions[selected] + 2, last_visible[selected], end_price[selected]
+            for offset in range(max(0, self.window - 3)):
+                alive = first + offset <= last
+                if not alive.any():
+                    break
+                first, last, prices = first[alive], last[alive], prices[alive]
+                # Mỗi gap có vị trí riêng nên các chỉ số trong một bước không trùng nhau
+                bars = first + offset
+                best[bars] = combine(best[bars], prices)
+
+        proximity = self.indicators.fvg.proximity
+        with np.errstate(invalid='ignore'):
+            near_bullish = (close - highest) / close < proximity
+            near_bearish = (lowest - close) / close < proximity
+        return near_bullish, near_bearish
+
+def summarize(runs, horizons):
+    """Gộp kết quả của nhiều chuỗi nến và tính lợi nhuận trung bình, tỷ lệ đúng hướng"""
+    signals = {}
+    baseline = {horizon: {'n': 0, 'sum_return': 0.0, 'hits': 0} for horizon in horizons}
+    for run in runs:
+        for name, tally in run['signals'].items():
+            total = signals.setdefault(name, {
+                'direction': tally['direction'], 'occurrences': 0, 'active_bars': 0,
+                'horizons': {horizon: {'n': 0, 'sum_return': 0.0, 'hits': 0} for horizon in horizons}
+            })
+            total['occurrences'] += tally['occurrences']
+            total['active_bars'] += tally['active_bars']
+            for horizon in horizons:
+                for key, value in tally['horizons'][horizon].items():
+                    total['horizons'][horizon][key] += value
+        for horizon in horizons:
+            for key, value in run['baseline'][horizon].items():
+                baseline[horizon][key] += value
+
+    def stats(tally, direction):
+        n = tally['n']
+        return {
+            'n': n,
+            'mean_return': tally['sum_return'] / n if n else None,
+            'hit_rate': tally['hits'] / n if n and direction != NEUTRAL else None
+        }
+
+    results = []
+    for name, total in signals.items():
+        results.append({
+            'signal': name,
+            'direction': DIRECTION_LABELS[total['direction']],
+            'occurrences': total['occurrences'],
+            'active_bars': total['active_bars'],
+            'horizons': {str(horizon): stats(total['horizons'][horizon], total['direction']) for horizon in horizons}
+        })
+    results.sort(key=lambda result: result['occurrences'], reverse=True)
+
+    return {
+        'bars': sum(run['bars'] for run in runs),
+        # up_rate: tỷ lệ nến có lợi nhuận dương sau h nến (mức nền cho tín hiệu tăng)
+        'baseline': {
+            str(horizon): {
+                'n': tally['n'],
+                'mean_return': tally['sum_return'] / tally['n'] if tally['n'] else None,
+                'up_rate': tally['hits'] / tally['n'] if tally['n'] else None
+            }
+            for horizon, tally in baseline.items()
+        },
+        'signals': results
+    }
+
+def print_summary(title, summary, horizons):
+    print(f"\n{title} ({summary['bars']} nến)")
+    header = ''.join(f"{f'h={horizon}':>16}" for horizon in horizons)
+    print(f"{'Tín hiệu':<30}{'Hướng':>9}{'Số lần':>9}{header}")
+    baseline = ''.join(
+        f"{_format_rate(summary['baseline'][str(horizon)]['up_rate']):>16}" for horizon in horizons
+    )
+    print(f"{'(mức nền: tỷ lệ tăng)':<30}{'':>9}{'':>9}{baseline}")
+    for result in summary['signals']:
+        cells = ''.join(
+            f"{_format_cell(result['horizons'][str(horizon)]):>16}" for horizon in horizons
+        )
+        print(f"{result['signal']:<30}{result['direction']:>9}{result['occurrences']:>9}{cells}")
+
+def _format_rate(value):
+    return '-' if value is None else f"{value * 100:.1f}%"
+
+def _format_cell(stats):
+    """Tỷ lệ đúng hướng (hoặc lợi nhuận trung bình với tín hiệu không có hướng)"""
+    if stats['hit_rate'] is not None:
+        return f"{stats['hit_rate'] * 100:.1f}%"
+    if stats['mean_return'] is not None:
+        return f"{stats['mean_return'] * 100:+.2f}% avg"
+    return '-'
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest tín hiệu cảnh báo trên dữ liệu OHLCV lịch sử")
+    parser.add_argument('files', nargs='+', help="File CSV nến (SYMBOL_TIMEFRAME.csv)")
+    parser.add_argument('--symbol', help="Cặp tiền (mặc định lấy từ tên file)")
+    parser.add_argument('--horizons', type=int, nargs='+', default=DEFAULT_HORIZONS)
+    parser.add_argument('--window', type=int, default=Config.KLINES_LIMIT)
+    parser.add_argument('--output', default='backtest_results.json')
+    args = parser.parse_args()
+
+    backtester = SignalBacktester(window=args.window, horizons=args.horizons)
+    runs = []
+    for path in args.files:
+        symbol, timeframe = parse_file_name(path)
+        symbol = args.symbol or symbol
+        df = load_ohlcv(path)
+
+        start = time.perf_counter()
+        run = backtester.run(df, symbol, timeframe)
+        elapsed = time.perf_counter() - start
+        run['file'] = path
+        run['elapsed_s'] = elapsed
+        runs.append(run)
+
+        label = f"{symbol}-{timeframe}" if timeframe else symbol
+        print_summary(f"{label}: {elapsed:.2f}s", summarize([run], args.horizons), args.horizons)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'window': args.window,
+            'horizons': args.horizons,
+            'files': [
+                {'file': run['file'], 'symbol': run['symbol'], 'timeframe': run['timeframe'],
+                 'bars': run['bars'], 'elapsed_s': run['elapsed_s']}
+                for run in runs
+            ]
+        },
+        'results': {
+            f"{run['symbol']}-{run['timeframe']}" if run['timeframe'] else run['symbol']: summarize([run], args.horizons)
+            for run in runs
+        }
+    }
+    if len(runs) > 1:
+        report['results']['ALL'] = summarize(runs, args.horizons)
+        print_summary("Tất cả", report['results']['ALL'], args.horizons)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nĐã ghi kết quả vào {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""Benchmark các bộ phân tích trong AdvancedIndicators.analyze_all.
+
+Sinh dữ liệu OHLCV giả lập (random walk có seed) ở nhiều kích thước, đo thời gian
+từng bộ phân tích và toàn bộ CryptoMacroAlertBot.analyze_advanced_patterns, rồi
+ghi kết quả ra JSON để so sánh giữa các commit.
+
+    python benchmarks/bench_advanced_indicators.py --sizes 100 1000 10000
+    python benchmarks/bench_advanced_indicators.py --compare old.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Thêm thư mục gốc của bot vào sys.path (giống main.py)
+BOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BOT_DIR)
+
+from advanced_indicators import AdvancedIndicators
+
+DEFAULT_SIZES = [100, 1_000, 10_000, 100_000, 1_000_000]
+
+def generate_ohlcv(bars, seed=42, start_price=30000.0, freq='h'):
+    """Sinh nến OHLCV từ random walk log-return với seed cố định"""
+    rng = np.random.default_rng(seed)
+    log_returns = rng.normal(0, 0.01, bars)
+    close = start_price * np.exp(np.cumsum(log_returns))
+    open_ = np.empty(bars)
+    open_[0] = start_price
+    open_[1:] = close[:-1]
+    wick = np.abs(rng.normal(0, 0.004, (2, bars)))
+    high = np.maximum(open_, close) * (1 + wick[0])
+    low = np.minimum(open_, close) * (1 - wick[1])
+    volume = rng.lognormal(mean=5, sigma=1, size=bars)
+    index = pd.date_range('2020-01-01', periods=bars, freq=freq)
+    return pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume}, index=index)
+
+def analyzer_cases(indicators):
+    """Các bước giống với AdvancedIndicators.analyze_all, mỗi bước đo riêng"""
+    def swing(df):
+        return indicators.get_swing_index(df, 'BENCH', 'bench')
+
+    return [
+        ('swing_index', lambda df: (indicators._swing_cache.clear(), swing(df))),
+        ('fibonacci', lambda df: indicators.fibonacci.identify_fibonacci_retracement(df, 'BENCH', 'bench')),
+        ('patterns.head_and_shoulders', lambda df: indicators.patterns.identify_head_and_shoulders(df, swing(df))),
+        ('patterns.double_top', lambda df: indicators.patterns.identify_double_top(df, swing(df))),
+        ('patterns.double_bottom', lambda df: indicators.patterns.identify_double_bottom(df, swing(df))),
+        ('patterns.triangle', lambda df: indicators.patterns.identify_triangle(df)),
+        ('patterns.wedge', lambda df: indicators.patterns.identify_wedge(df)),
+        ('elliott_wave', lambda df: indicators.elliott_wave.identify_elliott_waves(df, swing(df))),
+        ('fvg', lambda df: indicators.fvg.calculate_fvg(df)),
+        ('candlestick', lambda df: indicators.candlestick.identify_all(df)),
+        ('support_resistance', lambda df: indicators.support_resistance.find_levels(df, swing_index=swing(df))),
+        ('trendlines', lambda df: indicators.trendlines.draw_trendlines(df, swing(df))),
+        ('gann', lambda df: indicators.gann.calculate_gann_angles(df)),
+        ('momentum', lambda df: indicators.momentum.calculate_indicators(df)),
+        ('volume', lambda df: indicators.volume.analyze_volume(df)),
+        ('analyze_all', lambda df: (indicators._swing_cache.clear(), indicators.analyze_all(df, 'BENCH', 'bench')))
+    ]
+
+def end_to_end_case(indicators):
+    """analyze_advanced_patterns của bot; bỏ qua nếu môi trường thiếu module của main.py"""
+    try:
+        from main import CryptoMacroAlertBot
+    except ImportError as e:
+        return None, str(e)
+
+    # Chỉ cần advanced_indicators, không khởi tạo Telegram/Binance
+    bot = object.__new__(CryptoMacroAlertBot)
+    bot.advanced_indicators = indicators
+
+    def run(df):
+        indicators._swing_cache.clear()
+        return bot.analyze_advanced_patterns(df, 'BENCH', 'bench')
+
+    return run, None
+
+def time_call(func, df, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(df)
+        timings.append(time.perf_counter() - start)
+    return {
+        'min_s': min(timings),
+        'median_s': statistics.median(timings),
+        'mean_s': statistics.fmean(timings),
+        'repeat': repeat
+    }
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BOT_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(sizes, repeat, seed):
+    indicators = AdvancedIndicators()
+    cases = analyzer_cases(indicators)
+    end_to_end, skip_reason = end_to_end_case(indicators)
+    if end_to_end is not None:
+        cases.append(('analyze_advanced_patterns', end_to_end))
+    else:
+        print(f"⚠️ Bỏ qua analyze_advanced_patterns: {skip_reason}")
+
+    results = []
+    for bars in sizes:
+        df = generate_ohlcv(bars, seed=seed)
+        # Kích thước lớn chạy ít lần hơn để benchmark không kéo dài quá mức
+        case_repeat = repeat if bars <= 100_000 else 1
+        for name, func in cases:
+            stats = time_call(func, df, case_repeat)
+            results.append({'bars': bars, 'analyzer': name, **stats})
+            print(f"{bars:>9} bars  {name:<28} {stats['median_s'] * 1000:>12.2f} ms")
+
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'machine': platform.machine(),
+            'seed': seed,
+            'skipped': {'analyze_advanced_patterns': skip_reason} if skip_reason else {}
+        },
+        'results': results
+    }
+
+def compare(current, baseline_path):
+    """In tỷ lệ thời gian so với một file kết quả trước đó"""
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)
+    previous = {(r['bars'], r['analyzer']): r['median_s'] for r in baseline['results']}
+
+    print(f"\nSo sánh với {baseline['meta'].get('commit')} ({baseline_path}):")
+    for result in current['results']:
+        key = (result['bars'], result['analyzer'])
+        if key in previous and result['median_s'] > 0:
+            speedup = previous[key] / result['median_s']
+            print(f"{key[0]:>9} bars  {key[1]:<28} x{speedup:>8.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark AdvancedIndicators.analyze_all")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help="File JSON kết quả cũ để so sánh")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.sizes, args.repeat, args.seed)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nĐã ghi kết quả vào {args.output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,7 @@
 import asyncio
+import contextvars
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import os
 import sys
@@ -8,14 +10,22 @@ import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # Import các module cần thiết từ dự án
+from utils.alert_store import AlertStore
+from utils.chart_renderer import ChartRenderer
 from utils.config import Config
+from utils.ohlcv_cache import OHLCVCache
+from utils.profiling import Profiler
+from utils.resampler import TimeframeResampler
+from utils.streaming_indicators import IndicatorStateStore
+from utils.telegram_queue import TelegramDeliveryQueue
 from telegram_handler import TelegramHandler
 from indicators.ta_signals import TechnicalSignals
-from indicators.chart_plotter import ChartPlotter
 from macro_data.macro_checker import MacroChecker
 from weekly_forecast import WeeklyForecast
 from category_analyzer import CategoryAnalyzer
-from advanced_indicators import AdvancedIndicators
+from advanced_indicators import AdvancedIndicators, SIGNAL_OUTPUTS
+from advanced_indicators.momentum_oscillators import precomputed_series
+from advanced_indicators.process_pool import SharedMemoryAnalysisPool
 
 # Cấu hình logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -23,277 +33,319 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 class CryptoMacroAlertBot:
     def __init__(self):
         self.telegram = TelegramHandler()
+        # Gửi qua hàng đợi chạy nền: giới hạn tốc độ, thử lại khi bị 429 và gộp tin nhắn theo chu kỳ
+        self.delivery = TelegramDeliveryQueue(
+            self.telegram, rate_per_chat=Config.TELEGRAM_RATE_PER_CHAT,
+            burst=Config.TELEGRAM_BURST, max_retries=Config.TELEGRAM_MAX_RETRIES
+        )
         self.ta_signals = TechnicalSignals()
-        self.chart_plotter = ChartPlotter()
+        # Biểu đồ được vẽ trong thread pool riêng, trả về ảnh PNG trong bộ nhớ
+        self.chart_renderer = ChartRenderer(workers=Config.CHART_WORKERS)
         self.macro_checker = MacroChecker()
         self.weekly_forecast = WeeklyForecast()
         self.category_analyzer = CategoryAnalyzer()
-        self.advanced_indicators = AdvancedIndicators()
         
-        # Để theo dõi các cảnh báo crypto đã gửi, tránh gửi lặp lại
-        self.last_crypto_alerts_sent = {} # { (symbol, timeframe): last_alert_message_hash }
-        self.last_macro_alerts_sent = set() # { event_id }
-
-    def analyze_advanced_patterns(self, df, symbol, timeframe):
-        """Phân tích các mẫu hình nâng cao"""
-        analysis = self.advanced_indicators.analyze_all(df, symbol, timeframe)
-        
-        # Tổng hợp các tín hiệu
-        signals = []
-        
-        # Fibonacci signals
-        if analysis['fibonacci']['near_levels']:
-            for level, price in analysis['fibonacci']['near_levels']:
-                signals.append({
-                    'type': 'Fibonacci',
-                    'message': f"Giá đang gần mức Fibonacci {level} ({price:.2f})",
-                    'strength': 0.6
-                })
-        
-        # Pattern signals
-        for pattern_name, pattern in analysis['patterns'].items():
-            if pattern['detected']:
-                signals.append({
-                    'type': pattern['name'],
-                    'message': f"Phát hiện {pattern['name']} với độ tin cậy {pattern['strength']*100:.0f}%",
-                    'strength': pattern['strength']
-                })
-        
-        # Elliott Wave signals
-        if analysis['elliott_wave']['pattern']:
-            signals.append({
-                'type': 'Elliott Wave',
-                'message': f"Mẫu hình sóng Elliott: {analysis['elliott_wave']['pattern']}",
-                'strength': analysis['elliott_wave']['confidence']
-            })
-        
-        # FVG signals
-        fvg_signals = self.advanced_indicators.fvg.identify_fvg_signals(df, analysis['fvg'])
-        for signal in fvg_signals:
-            signals.append({
-                'type': 'FVG',
-                'message': f"Fair Value Gap {signal['direction']}",
-                'strength': signal['strength']
-            })
+        # Profiling theo từng giai đoạn/bộ phân tích (tắt mặc định)
+        self.profiler = Profiler(
+            enabled=Config.PROFILING_ENABLED, output_dir=Config.PROFILING_OUTPUT_DIR,
+            trace_memory=Config.PROFILING_TRACE_MEMORY
+        )
+        self.advanced_indicators = AdvancedIndicators(profiler=self.profiler)
         
-        # Candlestick signals
-        for pattern_type, patterns in analysis['candlestick'].items():
-            for pattern in patterns:
-                signals.append({
-                    'type': 'Candlestick',
-                    'message': f"Mẫu nến {pattern['type']}",
-                    'strength': pattern['strength']
-                })
+        # Bộ đệm nến theo cặp/khung thời gian: mỗi chu kỳ chỉ tải các nến mới
+        self.ohlcv_cache = OHLCVCache(self.ta_signals.get_klines, capacity=Config.KLINES_LIMIT)
         
-        # Support/Resistance signals
-        for level in analysis['support_resistance']['support']:
-            if abs(df['close'].iloc[-1] - level['price']) / df['close'].iloc[-1] < 0.02:
-                signals.append({
-                    'type': 'Support',
-                    'message': f"Giá đang gần mức hỗ trợ {level['price']:.2f}",
-                    'strength': level['strength']
-                })
+        # Chỉ tải khung nhỏ nhất, các khung lớn hơn được dựng lại từ đó
+        self.resampler = None
+        if Config.RESAMPLE_TIMEFRAMES_ENABLED:
+            self.resampler = TimeframeResampler(
+                self.ta_signals.get_klines, Config.TIMEFRAMES, capacity=Config.KLINES_LIMIT,
+                base_fetch=self.ohlcv_cache.get if Config.OHLCV_CACHE_ENABLED else None,
+                max_age=Config.RESAMPLE_MAX_AGE_SECONDS
+            )
         
-        for level in analysis['support_resistance']['resistance']:
-            if abs(df['close'].iloc[-1] - level['price']) / df['close'].iloc[-1] < 0.02:
-                signals.append({
-                    'type': 'Resistance',
-                    'message': f"Giá đang gần mức kháng cự {level['price']:.2f}",
-                    'strength': level['strength']
-                })
+        # Trạng thái chỉ báo streaming theo cặp/khung thời gian (chu kỳ chỉ báo theo cấu hình từng cặp)
+        self.indicator_store = IndicatorStateStore(
+            symbol_configs=Config.SYMBOL_CONFIGS, history=Config.KLINES_LIMIT
+        )
         
-        # Trendline signals
-        for trendline in analysis['trendlines']['uptrend']:
-            signals.append({
-                'type': 'Uptrend',
-                'message': f"Đường xu hướng tăng được xác nhận",
-                'strength': trendline['strength']
-            })
-        
-        for trendline in analysis['trendlines']['downtrend']:
-            signals.append({
-                'type': 'Downtrend',
-                'message': f"Đường xu hướng giảm được xác nhận",
-                'strength': trendline['strength']
-            })
-        
-        # Momentum signals
-        momentum_signals = []
+        # Để theo dõi các cảnh báo đã gửi, tránh gửi lặp lại (kể cả sau khi khởi động lại)
+        self.alert_store = AlertStore(
+            Config.ALERT_STORE_PATH, ttl=Config.ALERT_DEDUP_TTL_HOURS * 3600,
+            max_entries=Config.ALERT_STORE_MAX_ENTRIES
+        )
+
+        # Pipeline xử lý đồng thời: thread pool cho giai đoạn tính toán
+        self.cpu_executor = ThreadPoolExecutor(max_workers=Config.CPU_WORKERS, thread_name_prefix="analysis")
+        self.fetch_semaphore = None
         
-        # RSI signals
-        rsi = analysis['momentum']['rsi']
-        if rsi['signal'] == 'overbought':
-            momentum_signals.append({
-                'type': 'RSI Overbought',
-                'message': f"RSI ở vùng quá mua ({rsi['current']:.2f})",
-                'strength': 0.7,
-                'direction': 'bearish'
-            })
-        elif rsi['signal'] == 'oversold':
-            momentum_signals.append({
-                'type': 'RSI Oversold',
-                'message': f"RSI ở vùng quá bán ({rsi['current']:.2f})",
-                'strength': 0.7,
-                'direction': 'bullish'
-            })
+        # Chế độ process pool: analyze_all chạy ở tiến trình worker, OHLCV truyền qua shared memory
+        self.analysis_pool = None
+        if Config.ANALYSIS_EXECUTOR == 'process':
+            self.analysis_pool = SharedMemoryAnalysisPool(max_workers=Config.PROCESS_POOL_WORKERS)
+
+    def analyze_advanced_patterns(self, df, symbol, timeframe, precomputed=None):
+        """Phân tích các mẫu hình nâng cao"""
+        # Chỉ tính các kết quả được dùng để tạo tín hiệu
+        analysis = self.advanced_indicators.analyze_all(
+            df, symbol, timeframe, outputs=SIGNAL_OUTPUTS, precomputed=precomputed
+        )
+        return self.advanced_indicators.collect_signals(df, analysis)
+    
+    def fetch_klines(self, symbol, timeframe):
+        """Tải dữ liệu nến cho một cặp/khung thời gian (blocking I/O)"""
+        if self.resampler is not None:
+            return self.resampler.get(symbol, timeframe)
+        if Config.OHLCV_CACHE_ENABLED:
+            return self.ohlcv_cache.get(symbol, timeframe)
+        return self.ta_signals.get_klines(symbol, timeframe, limit=Config.KLINES_LIMIT)
+
+    def analyze_symbol_timeframe(self, df, symbol, timeframe, include_advanced=True):
+        """Giai đoạn CPU: kiểm tra dữ liệu, tính chỉ báo và phân tích mẫu hình"""
+        if df.empty:
+            logging.warning(f"❌ Không lấy được dữ liệu cho {symbol}-{timeframe}")
+            return None
         
-        # MACD signals
-        macd = analysis['momentum']['macd']
-        if macd['signal'] == 'bullish':
-            momentum_signals.append({
-                'type': 'MACD Bullish',
-                'message': "MACD có tín hiệu tăng",
-                'strength': 0.6,
-                'direction': 'bullish'
-            })
-        elif macd['signal'] == 'bearish':
-            momentum_signals.append({
-                'type': 'MACD Bearish',
-                'message': "MACD có tín hiệu giảm",
-                'strength': 0.6,
-                'direction': 'bearish'
-            })
+        # Kiểm tra dữ liệu có đủ nến không
+        if len(df) < Config.KLINES_LIMIT:
+            logging.warning(f"❌ Dữ liệu không đủ cho {symbol}-{timeframe} (cần ít nhất {Config.KLINES_LIMIT} nến)")
+            return None
         
-        # Volume signals
-        for volume_signal in analysis['volume']['volume_signals']:
-            signals.append({
-                'type': volume_signal['type'],
-                'message': volume_signal['message'],
-                'strength': volume_signal['strength']
-            })
+        # Kiểm tra dữ liệu có giá trị NaN không
+        if df.isnull().values.any():
+            logging.warning(f"⚠️ Dữ liệu có giá trị NaN cho {symbol}-{timeframe}")
+            df = df.ffill()  # Điền giá trị NaN bằng giá trị trước đó
+
+        with self.profiler.stage('indicators'):
+            df_with_indicators = self.ta_signals.calculate_indicators(df, symbol, timeframe)
+
+        # RSI/MACD/Stochastic/OBV/EMA lấy từ trạng thái streaming (cập nhật O(1) mỗi nến đã đóng)
+        # ghi đè lên các cột cùng tên; các cột khác của calculate_indicators (BB, ...) giữ nguyên
+        streaming_values = None
+        precomputed = None
+        if Config.STREAMING_INDICATORS_ENABLED and not df_with_indicators.empty:
+            with self.profiler.stage('streaming_indicators'):
+                indicator_columns = self.indicator_store.sync(symbol, timeframe, df)
+            df_with_indicators[list(indicator_columns.columns)] = indicator_columns
+            streaming_values = indicator_columns.iloc[-1].to_dict()
+            # Bộ phân tích động lượng chỉ dùng lại các chuỗi có cùng chu kỳ với nó
+            precomputed = precomputed_series(indicator_columns, self.indicator_store.windows(symbol, timeframe))
+
+        if df_with_indicators.empty or df_with_indicators.isnull().all().all():
+            logging.warning(f"⚠️ Không thể tính toán chỉ báo cho {symbol}-{timeframe} hoặc dữ liệu chỉ báo toàn NaN.")
+            return None
+
+        alert_message = ""
+        # Khóa chống gửi lặp của từng tín hiệu: (chỉ báo, trạng thái, ngưỡng), không chứa giá trị đọc được
+        alert_signals = []
+        confirmation_count = 0
+        alert_strength = "YẾU"
         
-        return signals, momentum_signals
-    
-    async def run_check(self):
-        logging.info("Bắt đầu chu kỳ kiểm tra cảnh báo...")
+        # Lấy dữ liệu nến cuối cùng để kiểm tra tín hiệu
+        latest_data = df_with_indicators.iloc[-1]
+        prev_data = df_with_indicators.iloc[-2] if len(df_with_indicators) > 1 else None
 
-        # --- 1. Kiểm tra Macro Data ---
-        macro_alerts = self.macro_checker.get_new_macro_alerts()
-        for alert_message in macro_alerts:
-            # So sánh với các cảnh báo đã gửi để tránh lặp
-            # Để đơn giản, ta dựa vào việc event_id đã được thêm vào notified_macro_events trong MacroChecker
-            await self.telegram.send_message(alert_message)
+        # Kiểm tra RSI
+        if 'rsi' in latest_data:
+            latest_rsi = latest_data['rsi']
+            # Lấy cấu hình cho cặp tiền
+            symbol_config = Config.SYMBOL_CONFIGS.get(symbol, Config.SYMBOL_CONFIGS['DEFAULT'])
+            rsi_oversold = symbol_config.get('rsi_oversold', Config.RSI_OVERSOLD_THRESHOLD)
+            rsi_overbought = symbol_config.get('rsi_overbought', Config.RSI_OVERBOUGHT_THRESHOLD)
+            
+            # Cảnh báo RSI quá bán
+            if latest_rsi < rsi_oversold:
+                alert_message += f"- RSI ({latest_rsi:.2f}) quá bán ({rsi_oversold}).\n"
+                alert_signals.append(('rsi', 'oversold', rsi_oversold))
+                confirmation_count += 1
+                alert_strength = "TRUNG BÌNH"
+            
+            # Cảnh báo RSI quá mua
+            elif latest_rsi > rsi_overbought:
+                alert_message += f"- RSI ({latest_rsi:.2f}) quá mua ({rsi_overbought}).\n"
+                alert_signals.append(('rsi', 'overbought', rsi_overbought))
+                confirmation_count += 1
+                alert_strength = "TRUNG BÌNH"
 
-        # --- 2. Kiểm tra Crypto Data ---
-        for symbol in Config.SYMBOLS:
-            for timeframe in Config.TIMEFRAMES:
-                logging.info(f"📊 Đang xử lý Crypto {symbol}-{timeframe}")
+        # ... (các phần kiểm tra khác không đổi)
 
-                df = self.ta_signals.get_klines(symbol, timeframe, limit=100) 
-                
-                if df.empty:
-                    logging.warning(f"❌ Không lấy được dữ liệu cho {symbol}-{timeframe}")
-                    continue
-                
-                # Kiểm tra dữ liệu có đủ nến không
-                if len(df) < 100:
-                    logging.warning(f"❌ Dữ liệu không đủ cho {symbol}-{timeframe} (cần ít nhất 100 nến)")
-                    continue
-                
-                # Kiểm tra dữ liệu có giá trị NaN không
-                if df.isnull().values.any():
-                    logging.warning(f"⚠️ Dữ liệu có giá trị NaN cho {symbol}-{timeframe}")
-                    df = df.fillna(method='ffill')  # Điền giá trị NaN bằng giá trị trước đó
+        # Phân tích các mẫu hình nâng cao (ở chế độ process pool, bước này chạy sau trong worker)
+        advanced_signals, momentum_signals = [], []
+        if include_advanced:
+            with self.profiler.stage('advanced'):
+                advanced_signals, momentum_signals = self.analyze_advanced_patterns(
+                    df_with_indicators, symbol, timeframe, precomputed=precomputed
+                )
 
-                df_with_indicators = self.ta_signals.calculate_indicators(df, symbol, timeframe) 
+        return {
+            'symbol': symbol,
+            'timeframe': timeframe,
+            'df': df_with_indicators,
+            'alert_message': alert_message,
+            'alert_signals': alert_signals,
+            'confirmation_count': confirmation_count,
+            'alert_strength': alert_strength,
+            'advanced_signals': advanced_signals,
+            'momentum_signals': momentum_signals,
+            'streaming_indicators': streaming_values,
+            'precomputed': precomputed
+        }
 
-                if df_with_indicators.empty or df_with_indicators.isnull().all().all():
-                    logging.warning(f"⚠️ Không thể tính toán chỉ báo cho {symbol}-{timeframe} hoặc dữ liệu chỉ báo toàn NaN.")
-                    continue
+    async def deliver_symbol_timeframe(self, result):
+        """Giai đoạn I/O: gửi cảnh báo của một cặp/khung thời gian lên Telegram"""
+        symbol = result['symbol']
+        timeframe = result['timeframe']
+        df_with_indicators = result['df']
+        alert_message = result['alert_message']
+        alert_signals = result['alert_signals']
+        confirmation_count = result['confirmation_count']
+        alert_strength = result['alert_strength']
+        advanced_signals = result['advanced_signals']
+        momentum_signals = result['momentum_signals']
 
-                alert_message = ""
-                confirmation_count = 0
-                alert_strength = "YẾU"
-                
-                # Lấy dữ liệu nến cuối cùng để kiểm tra tín hiệu
-                latest_data = df_with_indicators.iloc[-1]
-                prev_data = df_with_indicators.iloc[-2] if len(df_with_indicators) > 1 else None
-
-                # Kiểm tra RSI
-                if 'rsi' in latest_data:
-                    latest_rsi = latest_data['rsi']
-                    # Lấy cấu hình cho cặp tiền
-                    symbol_config = Config.SYMBOL_CONFIGS.get(symbol, Config.SYMBOL_CONFIGS['DEFAULT'])
-                    rsi_oversold = symbol_config.get('rsi_oversold', Config.RSI_OVERSOLD_THRESHOLD)
-                    rsi_overbought = symbol_config.get('rsi_overbought', Config.RSI_OVERBOUGHT_THRESHOLD)
-                    
-                    # Cảnh báo RSI quá bán
-                    if latest_rsi < rsi_oversold:
-                        alert_message += f"- RSI ({latest_rsi:.2f}) quá bán ({rsi_oversold}).\n"
-                        confirmation_count += 1
-                        alert_strength = "TRUNG BÌNH"
-                    
-                    # Cảnh báo RSI quá mua
-                    elif latest_rsi > rsi_overbought:
-                        alert_message += f"- RSI ({latest_rsi:.2f}) quá mua ({rsi_overbought}).\n"
-                        confirmation_count += 1
-                        alert_strength = "TRUNG BÌNH"
-
-                # ... (các phần kiểm tra khác không đổi)
-
-                # 4. Gửi cảnh báo nếu có tín hiệu VÀ tín hiệu là MỚI
-                if alert_message and confirmation_count >= 2:  # Yêu cầu ít nhất 2 chỉ báo xác nhận
-                    current_message_hash = hash(alert_message) # Tạo hash từ nội dung tin nhắn
-                    
-                    # Chỉ gửi nếu tin nhắn cảnh báo khác với lần cuối cùng gửi cho cặp/khung thời gian này
-                    if self.last_crypto_alerts_sent.get((symbol, timeframe)) != current_message_hash:
-                        current_time_str = datetime.now().strftime("%Y%m%d%H%M%S")
-                        chart_filename = f"{symbol}_{timeframe}_alert_{current_time_str}.png"
-                        chart_path = self.chart_plotter.plot_chart(df_with_indicators, symbol, timeframe, chart_filename)
-
-                        full_message = (
-                            f"📈 *Cảnh báo Crypto: {symbol} - {timeframe}*\n"
-                            f"⏰ Thời gian: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-                            f"⚡️ *Tín hiệu ({confirmation_count} chỉ báo xác nhận):*\n{alert_message}\n"
-                            f"💪 *Độ mạnh:* {alert_strength}\n"
-                            f"\\#CryptoAlert \\#{symbol} \\#{timeframe}"
-                        )
-
-                        if chart_path:
-                            await self.telegram.send_photo(chart_path, caption=full_message)
-                            # Xóa ảnh sau khi gửi để tránh đầy bộ nhớ
-                            try:
-                                os.remove(chart_path)
-                                logging.info(f"Đã xóa file ảnh: {chart_path}")
-                            except OSError as e:
-                                logging.error(f"Lỗi khi xóa file ảnh {chart_path}: {e}")
-                        else:
-                            await self.telegram.send_message(full_message)
-                        
-                        # Cập nhật hash của tin nhắn đã gửi
-                        self.last_crypto_alerts_sent[(symbol, timeframe)] = current_message_hash
+        # 4. Gửi cảnh báo nếu có tín hiệu VÀ tín hiệu là MỚI
+        if alert_message and confirmation_count >= 2:  # Yêu cầu ít nhất 2 chỉ báo xác nhận
+            # Chỉ gửi nếu tập tín hiệu khác với lần cuối cùng gửi cho cặp/khung thời gian này
+            if self.alert_store.is_new(('crypto', symbol, timeframe), alert_signals):
+                with self.profiler.stage('chart'):
+                    chart = await self.chart_renderer.render_async(df_with_indicators, symbol, timeframe)
+
+                full_message = (
+                    f"📈 *Cảnh báo Crypto: {symbol} - {timeframe}*\n"
+                    f"⏰ Thời gian: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+                    f"⚡️ *Tín hiệu ({confirmation_count} chỉ báo xác nhận):*\n{alert_message}\n"
+                    f"💪 *Độ mạnh:* {alert_strength}\n"
+                    f"\\#CryptoAlert \\#{symbol} \\#{timeframe}"
+                )
+
+                if chart is not None:
+                    await self.delivery.send_photo(chart, caption=full_message)
                 else:
-                    logging.info(f"Không có tín hiệu cảnh báo mới cho {symbol}-{timeframe}.")
-                    # Reset hash nếu không có cảnh báo nào, để lần sau nếu có cảnh báo lại sẽ gửi
-                    self.last_crypto_alerts_sent[(symbol, timeframe)] = None
+                    self.delivery.add_message(full_message)
                 
-                # Phân tích các mẫu hình nâng cao
-                advanced_signals, momentum_signals = self.analyze_advanced_patterns(df_with_indicators, symbol, timeframe)
+                # Chỉ ghi nhận đã gửi khi tin nhắn đã vào hàng đợi
+                self.alert_store.mark_sent(('crypto', symbol, timeframe), alert_signals)
+        else:
+            logging.info(f"Không có tín hiệu cảnh báo mới cho {symbol}-{timeframe}.")
+            # Reset nếu không có cảnh báo nào, để lần sau nếu có cảnh báo lại sẽ gửi
+            self.alert_store.reset(('crypto', symbol, timeframe))
+        
+        if advanced_signals or momentum_signals:
+            advanced_message = f"🔍 *MẪU HÌNH NÂNG CAO: {symbol} - {timeframe}*\n\n"
+            
+            # Thêm các tín hiệu nâng cao
+            for signal in advanced_signals:
+                strength_emoji = "🔴" if signal['strength'] > 0.7 else "🟡" if signal['strength'] > 0.5 else "🟢"
+                advanced_message += f"{strength_emoji} {signal['type']}: {signal['message']}\n"
+            
+            # Thêm các tín hiệu động lượng
+            if momentum_signals:
+                advanced_message += "\n📊 *CHỈ BÁO ĐỘNG LƯỢNG*\n\n"
+                for signal in momentum_signals:
+                    direction_emoji = "📈" if signal['direction'] == 'bullish' else "📉"
+                    advanced_message += f"{direction_emoji} {signal['type']}: {signal['message']}\n"
+            
+            # Cảnh báo nâng cao được gộp với các cặp khác khi flush cuối chu kỳ
+            self.delivery.add_message(advanced_message)
+
+    async def process_symbol_timeframe(self, symbol, timeframe):
+        """Pipeline cho một cặp/khung thời gian: tải dữ liệu -> phân tích -> gửi"""
+        logging.info(f"📊 Đang xử lý Crypto {symbol}-{timeframe}")
+        stage = self.profiler.stage
+
+        include_advanced = self.analysis_pool is None
+        loop = asyncio.get_running_loop()
+
+        with stage(f"{symbol}-{timeframe}"):
+            if Config.CONCURRENT_PIPELINE_ENABLED:
+                # Giai đoạn tải dữ liệu: giới hạn số request song song tới sàn
+                async with self.fetch_semaphore:
+                    with stage('fetch'):
+                        df = await asyncio.to_thread(self.fetch_klines, symbol, timeframe)
                 
-                if advanced_signals or momentum_signals:
-                    advanced_message = "🔍 *MẪU HÌNH NÂNG CAO*\n\n"
-                    
-                    # Thêm các tín hiệu nâng cao
-                    for signal in advanced_signals:
-                        strength_emoji = "🔴" if signal['strength'] > 0.7 else "🟡" if signal['strength'] > 0.5 else "🟢"
-                        advanced_message += f"{strength_emoji} {signal['type']}: {signal['message']}\n"
-                    
-                    # Thêm các tín hiệu động lượng
-                    if momentum_signals:
-                        advanced_message += "\n📊 *CHỈ BÁO ĐỘNG LƯỢNG*\n\n"
-                        for signal in momentum_signals:
-                            direction_emoji = "📈" if signal['direction'] == 'bullish' else "📉"
-                            advanced_message += f"{direction_emoji} {signal['type']}: {signal['message']}\n"
-                    
-                    # Gửi cảnh báo nâng cao
-                    await self.telegram.send_message(advanced_message)
-
-        # Gửi báo cáo category hàng ngày
-        if Config.CATEGORY_REPORT_ENABLED:
-            await self.category_analyzer.send_category_report()
-
-        # Gửi dự báo tuần vào Chủ Nhật
-        await self.weekly_forecast.send_weekly_forecast()
+                # Giai đoạn CPU: chạy trong thread pool để không chặn event loop
+                # (copy context để profiler giữ đúng ngăn xếp giai đoạn trong luồng worker)
+                with stage('analyze'):
+                    result = await loop.run_in_executor(
+                        self.cpu_executor, contextvars.copy_context().run,
+                        self.analyze_symbol_timeframe, df, symbol, timeframe, include_advanced
+                    )
+            else:
+                with stage('fetch'):
+                    df = self.fetch_klines(symbol, timeframe)
+                with stage('analyze'):
+                    result = self.analyze_symbol_timeframe(df, symbol, timeframe, include_advanced)
+
+            if result is not None and self.analysis_pool is not None:
+                # Chỉ các tín hiệu đã tổng hợp được gửi về từ worker
+                with stage('advanced'):
+                    result['advanced_signals'], result['momentum_signals'] = await self.analysis_pool.analyze(
+                        loop, result['df'], symbol, timeframe, precomputed=result['precomputed']
+                    )
+
+            if result is not None:
+                with stage('deliver'):
+                    await self.deliver_symbol_timeframe(result)
+
+    async def run_crypto_checks(self):
+        """Kiểm tra tất cả các cặp tiền x khung thời gian"""
+        pairs = [(symbol, timeframe) for symbol in Config.SYMBOLS for timeframe in Config.TIMEFRAMES]
+
+        if not Config.CONCURRENT_PIPELINE_ENABLED:
+            for symbol, timeframe in pairs:
+                await self.process_symbol_timeframe(symbol, timeframe)
+            return
+
+        # Semaphore phải được tạo trong event loop đang chạy
+        self.fetch_semaphore = asyncio.Semaphore(Config.MAX_CONCURRENT_FETCHES)
+        in_flight = asyncio.Semaphore(Config.MAX_IN_FLIGHT)
+
+        async def bounded(symbol, timeframe):
+            async with in_flight:
+                await self.process_symbol_timeframe(symbol, timeframe)
+
+        # Lỗi của một cặp không làm dừng cả chu kỳ
+        results = await asyncio.gather(*(bounded(symbol, timeframe) for symbol, timeframe in pairs), return_exceptions=True)
+        for (symbol, timeframe), result in zip(pairs, results):
+            if isinstance(result, Exception):
+                logging.error(f"❌ Lỗi khi xử lý {symbol}-{timeframe}: {result}", exc_info=result)
+
+    async def run_check(self):
+        logging.info("Bắt đầu chu kỳ kiểm tra cảnh báo...")
+
+        stage = self.profiler.stage
+
+        with stage('run_check'):
+            # --- 1. Kiểm tra Macro Data ---
+            with stage('macro'):
+                macro_alerts = self.macro_checker.get_new_macro_alerts()
+                for alert_message in macro_alerts:
+                    # MacroChecker chỉ nhớ các sự kiện đã báo trong bộ nhớ: kho cảnh báo chặn gửi lặp sau khi khởi động lại
+                    if self.alert_store.is_new(('macro', alert_message)):
+                        self.delivery.add_message(alert_message)
+                        self.alert_store.mark_sent(('macro', alert_message))
+
+            # --- 2. Kiểm tra Crypto Data ---
+            with stage('crypto'):
+                await self.run_crypto_checks()
+
+            # Gộp các tin nhắn của chu kỳ và giao cho worker gửi nền
+            await self.delivery.flush()
+
+            # Xóa các cảnh báo đã hết hạn khỏi kho chống gửi lặp
+            self.alert_store.prune()
+
+            # Gửi báo cáo category hàng ngày
+            if Config.CATEGORY_REPORT_ENABLED:
+                with stage('category_report'):
+                    await self.category_analyzer.send_category_report()
+
+            # Gửi dự báo tuần vào Chủ Nhật
+            with stage('weekly_forecast'):
+                await self.weekly_forecast.send_weekly_forecast()
+
+        if self.profiler.enabled:
+            self.profiler.dump()
 
         logging.info("Kết thúc chu kỳ kiểm tra cảnh báo.")
 
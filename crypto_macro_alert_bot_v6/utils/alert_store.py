@@ -0,0 +1,104 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+def stable_digest(*parts):
+    """sha256 của các thành phần (dạng JSON), giống nhau giữa các tiến trình và lần khởi động"""
+    payload = json.dumps(parts, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class AlertStore:
+    """Kho chống gửi lặp cảnh báo, lưu trong SQLite (WAL) nên giữ được qua các lần khởi động lại.
+
+    Mỗi khóa cảnh báo (vd. ('crypto', symbol, timeframe)) lưu digest của tập tín hiệu
+    đã gửi gần nhất. is_new() trả về True khi tập tín hiệu khác lần trước hoặc bản ghi
+    đã quá `ttl` giây (cảnh báo kéo dài được nhắc lại); mark_sent() chỉ được gọi sau
+    khi tin nhắn đã vào hàng đợi, nên lỗi vẽ biểu đồ/gửi không làm mất cảnh báo. Toàn bộ bản ghi được giữ trong
+    bộ nhớ để tra cứu, SQLite chỉ nhận các lần ghi; prune() xóa bản ghi hết hạn và giữ
+    tối đa `max_entries` bản ghi mới nhất.
+    """
+
+    def __init__(self, path, ttl=24 * 3600, max_entries=100000, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}  # { key_digest: (signals_digest, sent_at) }
+
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sent_alerts ("
+            "key TEXT PRIMARY KEY, digest TEXT NOT NULL, sent_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sent_alerts_sent_at ON sent_alerts (sent_at)")
+
+        self.prune()
+        with self._lock:
+            rows = self._conn.execute("SELECT key, digest, sent_at FROM sent_alerts").fetchall()
+            self._entries = {key: (digest, sent_at) for key, digest, sent_at in rows}
+        logging.info(f"Đã nạp {len(self._entries)} cảnh báo đã gửi từ {path}")
+
+    def is_new(self, key, signals=()):
+        """True nếu cảnh báo chưa được gửi: tập tín hiệu khác lần trước hoặc đã quá `ttl` giây"""
+        key_digest, digest = self._digests(key, signals)
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key_digest)
+            return entry is None or entry[0] != digest or now - entry[1] >= self.ttl
+
+    def mark_sent(self, key, signals=()):
+        """Ghi nhận cảnh báo đã gửi; chỉ gọi sau khi tin nhắn đã vào hàng đợi gửi"""
+        key_digest, digest = self._digests(key, signals)
+        now = self.clock()
+        with self._lock:
+            self._entries[key_digest] = (digest, now)
+            self._execute(
+                "INSERT OR REPLACE INTO sent_alerts (key, digest, sent_at) VALUES (?, ?, ?)",
+                (key_digest, digest, now)
+            )
+
+    def reset(self, key):
+        """Xóa cảnh báo đã gửi của khóa (tín hiệu đã hết), lần xuất hiện sau sẽ được gửi lại"""
+        key_digest = stable_digest(*key)
+        with self._lock:
+            if self._entries.pop(key_digest, None) is not None:
+                self._execute("DELETE FROM sent_alerts WHERE key = ?", (key_digest,))
+
+    @staticmethod
+    def _digests(key, signals):
+        return stable_digest(*key), stable_digest(sorted(set(signals)))
+
+    def prune(self):
+        """Xóa bản ghi hết hạn và giới hạn số bản ghi ở max_entries"""
+        expired_before = self.clock() - self.ttl
+        with self._lock:
+            self._entries = {
+                key: entry for key, entry in self._entries.items() if entry[1] >= expired_before
+            }
+            if len(self._entries) > self.max_entries:
+                newest = sorted(self._entries.items(), key=lambda item: item[1][1], reverse=True)
+                self._entries = dict(newest[:self.max_entries])
+
+            self._execute("DELETE FROM sent_alerts WHERE sent_at < ?", (expired_before,))
+            self._execute(
+                "DELETE FROM sent_alerts WHERE key NOT IN "
+                "(SELECT key FROM sent_alerts ORDER BY sent_at DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _execute(self, sql, params):
+        # Lỗi ghi (khóa file, đầy đĩa) không làm dừng bot: trạng thái trong bộ nhớ vẫn đúng
+        try:
+            self._conn.execute(sql, params)
+        except sqlite3.Error as e:
+            logging.error(f"❌ Lỗi khi ghi kho cảnh báo {self.path}: {e}")
@@ -0,0 +1,68 @@
+import asyncio
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import mplfinance as mpf
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+class ChartRenderer:
+    """Vẽ biểu đồ nến vào buffer PNG trong bộ nhớ, chạy ngoài event loop.
+
+    Mỗi luồng worker giữ một Figure và các trục (giá, khối lượng, RSI) riêng và
+    dùng lại giữa các lần vẽ; chỉ dùng Figure/FigureCanvasAgg (không qua pyplot)
+    nên không có trạng thái toàn cục dùng chung giữa các luồng.
+    """
+
+    def __init__(self, workers=1, figsize=(12, 8), dpi=100, style='yahoo'):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chart")
+        self.figsize = figsize
+        self.dpi = dpi
+        self.style = mpf.make_mpf_style(base_mpf_style=style)
+        self._local = threading.local()
+
+    async def render_async(self, df, symbol, timeframe):
+        """Vẽ biểu đồ trong thread pool riêng, trả về BytesIO (hoặc None nếu lỗi)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.render, df, symbol, timeframe)
+
+    def render(self, df, symbol, timeframe):
+        """Vẽ biểu đồ nến, khối lượng và RSI (nếu có) thành ảnh PNG trong bộ nhớ"""
+        try:
+            figure, (ax_price, ax_volume, ax_rsi) = self._figure()
+            for ax in (ax_price, ax_volume, ax_rsi):
+                ax.clear()
+
+            addplot = []
+            if 'rsi' in df.columns and df['rsi'].notna().any():
+                addplot.append(mpf.make_addplot(df['rsi'], ax=ax_rsi, color='purple', ylabel='RSI'))
+                ax_rsi.set_visible(True)
+            else:
+                ax_rsi.set_visible(False)
+
+            mpf.plot(
+                df[['open', 'high', 'low', 'close', 'volume']],
+                type='candle', ax=ax_price, volume=ax_volume, addplot=addplot,
+                style=self.style, datetime_format='%m-%d %H:%M', xrotation=0
+            )
+            ax_price.set_title(f"{symbol} - {timeframe}")
+
+            buffer = io.BytesIO()
+            figure.savefig(buffer, format='png', dpi=self.dpi)
+            buffer.seek(0)
+            return buffer
+        except Exception as e:
+            logging.error(f"❌ Lỗi khi vẽ biểu đồ {symbol}-{timeframe}: {e}", exc_info=True)
+            return None
+
+    def _figure(self):
+        """Figure và các trục của luồng hiện tại, tạo một lần rồi dùng lại"""
+        cached = getattr(self._local, 'figure', None)
+        if cached is None:
+            figure = Figure(figsize=self.figsize, dpi=self.dpi)
+            FigureCanvasAgg(figure)
+            axes = figure.subplots(3, 1, sharex=True, gridspec_kw={'height_ratios': [3, 1, 1]})
+            cached = self._local.figure = (figure, tuple(axes))
+        return cached
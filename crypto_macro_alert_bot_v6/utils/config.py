@@ -15,6 +15,43 @@ CHECK_INTERVAL_MINUTES = 15  # Kiểm tra mỗi 5 phút
 SYMBOLS = ["BTCUSDT", "ETHUSDT", "BNBUSDT", "ADAUSDT", "SOLUSDT"]
 TIMEFRAMES = ["1h", "4h", "1d"]
 
+# Số nến cần tải cho mỗi cặp/khung thời gian
+KLINES_LIMIT = 100
+OHLCV_CACHE_ENABLED = True  # Giữ nến trong bộ đệm, mỗi chu kỳ chỉ tải nến mới
+STREAMING_INDICATORS_ENABLED = True  # RSI/MACD/Stochastic/OBV cập nhật tăng dần theo từng nến đã đóng
+
+# Chỉ tải khung thời gian nhỏ nhất trong TIMEFRAMES, dựng các khung lớn hơn bằng cách gộp nến
+RESAMPLE_TIMEFRAMES_ENABLED = True
+RESAMPLE_MAX_AGE_SECONDS = 30  # Dữ liệu khung nhỏ được dùng chung cho các khung lớn trong khoảng này
+
+# Cấu hình pipeline xử lý đồng thời
+CONCURRENT_PIPELINE_ENABLED = True
+MAX_IN_FLIGHT = 20  # Số cặp/khung thời gian được xử lý cùng lúc tối đa
+MAX_CONCURRENT_FETCHES = 10  # Số request tải nến song song tối đa
+CPU_WORKERS = 4  # Số luồng cho giai đoạn tính toán chỉ báo
+
+# Nơi chạy analyze_all: "thread" (thread pool, mặc định) hoặc "process" (process pool + shared memory)
+ANALYSIS_EXECUTOR = os.getenv("ANALYSIS_EXECUTOR", "thread").lower()
+PROCESS_POOL_WORKERS = os.cpu_count() or 1  # Số tiến trình worker khi dùng "process"
+
+# Profiling theo giai đoạn (ghi file .folded và _summary.json mỗi chu kỳ)
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILING_OUTPUT_DIR = "profiles"
+PROFILING_TRACE_MEMORY = os.getenv("PROFILING_TRACE_MEMORY", "false").lower() == "true"  # Đo byte bằng tracemalloc (chậm hơn)
+
+# Hàng đợi gửi Telegram: giới hạn tốc độ theo từng chat và số lần thử lại
+TELEGRAM_RATE_PER_CHAT = 1.0  # Số tin nhắn mỗi giây cho một chat
+TELEGRAM_BURST = 3  # Số tin nhắn được gửi liên tiếp tối đa
+TELEGRAM_MAX_RETRIES = 5
+
+# Vẽ biểu đồ: số luồng vẽ chạy ngoài event loop (mỗi luồng giữ một Figure dùng lại)
+CHART_WORKERS = 1
+
+# Kho chống gửi lặp cảnh báo (SQLite), giữ qua các lần khởi động lại
+ALERT_STORE_PATH = os.getenv("ALERT_STORE_PATH", "alerts.db")
+ALERT_DEDUP_TTL_HOURS = 24  # Cảnh báo không đổi được nhắc lại sau khoảng thời gian này
+ALERT_STORE_MAX_ENTRIES = 100000
+
 # Ngưỡng RSI
 RSI_OVERSOLD_THRESHOLD = 30
 RSI_OVERBOUGHT_THRESHOLD = 70
@@ -135,6 +172,27 @@ class Config:
     CHECK_INTERVAL_MINUTES = CHECK_INTERVAL_MINUTES
     SYMBOLS = SYMBOLS
     TIMEFRAMES = TIMEFRAMES
+    KLINES_LIMIT = KLINES_LIMIT
+    OHLCV_CACHE_ENABLED = OHLCV_CACHE_ENABLED
+    STREAMING_INDICATORS_ENABLED = STREAMING_INDICATORS_ENABLED
+    RESAMPLE_TIMEFRAMES_ENABLED = RESAMPLE_TIMEFRAMES_ENABLED
+    RESAMPLE_MAX_AGE_SECONDS = RESAMPLE_MAX_AGE_SECONDS
+    CONCURRENT_PIPELINE_ENABLED = CONCURRENT_PIPELINE_ENABLED
+    MAX_IN_FLIGHT = MAX_IN_FLIGHT
+    MAX_CONCURRENT_FETCHES = MAX_CONCURRENT_FETCHES
+    CPU_WORKERS = CPU_WORKERS
+    ANALYSIS_EXECUTOR = ANALYSIS_EXECUTOR
+    PROCESS_POOL_WORKERS = PROCESS_POOL_WORKERS
+    PROFILING_ENABLED = PROFILING_ENABLED
+    PROFILING_OUTPUT_DIR = PROFILING_OUTPUT_DIR
+    PROFILING_TRACE_MEMORY = PROFILING_TRACE_MEMORY
+    TELEGRAM_RATE_PER_CHAT = TELEGRAM_RATE_PER_CHAT
+    TELEGRAM_BURST = TELEGRAM_BURST
+    TELEGRAM_MAX_RETRIES = TELEGRAM_MAX_RETRIES
+    CHART_WORKERS = CHART_WORKERS
+    ALERT_STORE_PATH = ALERT_STORE_PATH
+    ALERT_DEDUP_TTL_HOURS = ALERT_DEDUP_TTL_HOURS
+    ALERT_STORE_MAX_ENTRIES = ALERT_STORE_MAX_ENTRIES
     RSI_OVERSOLD_THRESHOLD = RSI_OVERSOLD_THRESHOLD
     RSI_OVERBOUGHT_THRESHOLD = RSI_OVERBOUGHT_THRESHOLD
     SYMBOL_CONFIGS = SYMBOL_CONFIGS
@@ -0,0 +1,191 @@
+import logging
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+OHLCV_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+# Độ dài của mỗi đơn vị khung thời gian (mili giây)
+TIMEFRAME_UNITS_MS = {
+    'm': 60 * 1000,
+    'h': 60 * 60 * 1000,
+    'd': 24 * 60 * 60 * 1000,
+    'w': 7 * 24 * 60 * 60 * 1000
+}
+
+def timeframe_to_ms(timeframe):
+    """Chuyển khung thời gian dạng '15m', '4h', '1d' sang mili giây"""
+    unit = timeframe[-1]
+    if unit not in TIMEFRAME_UNITS_MS or not timeframe[:-1].isdigit():
+        raise ValueError(f"Khung thời gian không được hỗ trợ: {timeframe}")
+    return int(timeframe[:-1]) * TIMEFRAME_UNITS_MS[unit]
+
+class OHLCVRingBuffer:
+    """Bộ đệm vòng kích thước cố định chứa nến OHLCV của một cặp/khung thời gian.
+
+    Mỗi nến được ghi hai lần (vị trí p và p + capacity) nên cửa sổ dữ liệu luôn
+    là một đoạn liền mạch trong mảng, nhờ đó view trả về không cần copy.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._times = np.zeros(2 * capacity, dtype=np.int64)
+        self._values = np.zeros((len(OHLCV_COLUMNS), 2 * capacity), dtype=float)
+        self._start = 0
+        self._size = 0
+        self.index_name = None
+        self.index_tz = None
+        self.is_datetime_index = True
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def last_open_time(self):
+        """Thời gian mở (ns) của nến mới nhất, None nếu bộ đệm rỗng"""
+        if self._size == 0:
+            return None
+        return int(self._times[self._start + self._size - 1])
+
+    def load(self, df):
+        """Nạp lại toàn bộ bộ đệm từ DataFrame (giữ lại `capacity` nến mới nhất)"""
+        df = df.iloc[-self.capacity:]
+        times = self._index_to_int(df.index)
+        values = df.loc[:, list(OHLCV_COLUMNS)].to_numpy(dtype=float).T
+
+        size = len(df)
+        self._times[:size] = times
+        self._times[self.capacity:self.capacity + size] = times
+        self._values[:, :size] = values
+        self._values[:, self.capacity:self.capacity + size] = values
+        self._start = 0
+        self._size = size
+
+    def merge(self, df):
+        """Ghi đè nến đang hình thành và thêm các nến mới hơn nến cuối cùng đã lưu.
+
+        Trả về False (không thay đổi bộ đệm) nếu dữ liệu mới bắt đầu sau nến cuối
+        đã lưu, tức là có nến bị thiếu ở giữa.
+        """
+        times = self._index_to_int(df.index)
+        values = df.loc[:, list(OHLCV_COLUMNS)].to_numpy(dtype=float)
+        last_open_time = self.last_open_time
+        if last_open_time is not None and len(times) and times[0] > last_open_time:
+            return False
+
+        for open_time, row in zip(times.tolist(), values):
+            if last_open_time is not None and open_time < last_open_time:
+                continue
+            if open_time == last_open_time:
+                self._write(self._size - 1, open_time, row)
+            else:
+                self._append(open_time, row)
+            last_open_time = open_time
+
+        return True
+
+    def arrays(self):
+        """Các mảng view (không copy) của cửa sổ dữ liệu hiện tại"""
+        window = slice(self._start, self._start + self._size)
+        arrays = {column: self._values[i, window] for i, column in enumerate(OHLCV_COLUMNS)}
+        arrays['open_time'] = self._times[window]
+        return arrays
+
+    def to_frame(self, copy=False):
+        """DataFrame dựng trên các view của bộ đệm.
+
+        Dữ liệu có thể bị ghi đè ở lần cập nhật tiếp theo nên chỉ dùng trong một chu kỳ;
+        copy=True trả về bản sao độc lập, dùng khi DataFrame được chuyển sang luồng khác.
+        """
+        arrays = self.arrays()
+        if copy:
+            arrays = {column: values.copy() for column, values in arrays.items()}
+        open_time = arrays.pop('open_time')
+        if self.is_datetime_index:
+            index = pd.DatetimeIndex(open_time.view('datetime64[ns]'), name=self.index_name)
+            if self.index_tz is not None:
+                index = index.tz_localize('UTC').tz_convert(self.index_tz)
+        else:
+            index = pd.Index(open_time, name=self.index_name)
+        return pd.DataFrame(arrays, index=index, copy=False)
+
+    def _append(self, open_time, row):
+        if self._size < self.capacity:
+            self._size += 1
+        else:
+            # Bộ đệm đầy: ghi đè nến cũ nhất
+            self._start = (self._start + 1) % self.capacity
+        self._write(self._size - 1, open_time, row)
+
+    def _write(self, position, open_time, row):
+        slot = (self._start + position) % self.capacity
+        for offset in (slot, slot + self.capacity):
+            self._times[offset] = open_time
+            self._values[:, offset] = row
+
+    def _index_to_int(self, index):
+        self.index_name = index.name
+        if isinstance(index, pd.DatetimeIndex):
+            self.is_datetime_index = True
+            self.index_tz = index.tz
+            if index.tz is not None:
+                index = index.tz_convert('UTC').tz_localize(None)
+            return index.to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+        self.is_datetime_index = False
+        return np.asarray(index, dtype=np.int64)
+
+class OHLCVCache:
+    """Bộ nhớ đệm nến theo (symbol, timeframe), chỉ tải các nến mới từ sàn"""
+
+    def __init__(self, fetch_klines, capacity=100, clock=time.time):
+        # fetch_klines(symbol, timeframe, limit) -> DataFrame OHLCV
+        self.fetch_klines = fetch_klines
+        self.capacity = capacity
+        self.clock = clock
+        self.buffers = {}
+        self._locks = {}
+
+    def get(self, symbol, timeframe):
+        """Cập nhật bộ đệm và trả về bản sao DataFrame cho cặp/khung thời gian.
+
+        Các cặp được xử lý đồng thời: view của bộ đệm có thể bị lần cập nhật sau ghi
+        đè khi luồng phân tích vẫn đang đọc, nên trả về bản sao (chỉ vài KB).
+        """
+        lock = self._locks.setdefault((symbol, timeframe), threading.Lock())
+        with lock:
+            buffer = self.buffers.get((symbol, timeframe))
+            if buffer is None:
+                buffer = OHLCVRingBuffer(self.capacity)
+                self.buffers[(symbol, timeframe)] = buffer
+
+            limit = self._missing_candles(buffer, timeframe)
+            df = self.fetch_klines(symbol, timeframe, limit=limit)
+            if df.empty:
+                return df
+
+            if limit >= self.capacity:
+                buffer.load(df)
+            elif not buffer.merge(df):
+                # Có khoảng trống giữa dữ liệu đã lưu và dữ liệu mới -> tải lại toàn bộ
+                logging.info(f"Dữ liệu nến {symbol}-{timeframe} bị ngắt quãng, tải lại {self.capacity} nến")
+                buffer.load(self.fetch_klines(symbol, timeframe, limit=self.capacity))
+
+            return buffer.to_frame(copy=True)
+
+    def _missing_candles(self, buffer, timeframe):
+        """Số nến cần tải: từ nến cuối đã lưu (đang hình thành) đến nến hiện tại"""
+        last_open_time = buffer.last_open_time
+        if last_open_time is None or not buffer.is_datetime_index:
+            return self.capacity
+
+        try:
+            interval_ms = timeframe_to_ms(timeframe)
+        except ValueError:
+            return self.capacity
+
+        now_ms = int(self.clock() * 1000)
+        elapsed_ms = max(0, now_ms - last_open_time // 1_000_000)
+        return min(self.capacity, elapsed_ms // interval_ms + 1)
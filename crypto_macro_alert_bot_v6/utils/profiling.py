@@ -0,0 +1,110 @@
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+# Context dùng chung khi tắt profiling: không đo gì, chi phí gần như bằng 0
+_NULL_STAGE = contextlib.nullcontext()
+
+# Ngăn xếp giai đoạn hiện tại của từng task/luồng (tương thích asyncio)
+_current_stack = contextvars.ContextVar('profiler_stack', default=())
+
+class Profiler:
+    """Đo thời gian thực và bộ nhớ theo từng giai đoạn lồng nhau.
+
+    Mỗi chu kỳ ghi ra hai file: `.folded` (collapsed stack, dùng được với
+    flamegraph.pl / speedscope) và `_summary.json` (tổng hợp theo tên giai đoạn).
+
+    Bộ nhớ là chênh lệch sau - trước giai đoạn, không phải số lần cấp phát (âm khi
+    giai đoạn giải phóng nhiều hơn cấp phát):
+    - trace_memory=True: `net_bytes` theo tracemalloc (chỉ bật khi profiling bật;
+      tracemalloc làm chậm việc cấp phát nên thời gian đo được sẽ dài hơn thực tế);
+    - mặc định: `approx_net_blocks` từ sys.getallocatedblocks(), gần như không tốn chi phí.
+    Cả hai là số liệu của cả tiến trình: khi pipeline chạy song song nhiều cặp,
+    số liệu của các giai đoạn chạy cùng lúc lẫn vào nhau. Muốn số liệu riêng từng
+    giai đoạn thì tắt CONCURRENT_PIPELINE_ENABLED khi đo.
+    """
+
+    def __init__(self, enabled=False, output_dir='profiles', trace_memory=False):
+        self.enabled = enabled
+        self.output_dir = output_dir
+        self.trace_memory = enabled and trace_memory
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.memory_field = 'net_bytes' if self.trace_memory else 'approx_net_blocks'
+        self._records = []
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        """Context manager đo một giai đoạn; không làm gì khi profiling bị tắt"""
+        if not self.enabled:
+            return _NULL_STAGE
+        return self._measure(name)
+
+    @contextlib.contextmanager
+    def _measure(self, name):
+        stack = _current_stack.get() + (name,)
+        token = _current_stack.set(stack)
+        memory_before = self._memory()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            memory = self._memory() - memory_before
+            _current_stack.reset(token)
+            with self._lock:
+                self._records.append((stack, elapsed, memory))
+
+    def _memory(self):
+        if self.trace_memory:
+            return tracemalloc.get_traced_memory()[0]
+        return sys.getallocatedblocks()
+
+    def dump(self):
+        """Ghi kết quả của chu kỳ vừa chạy ra file và xóa dữ liệu đã thu thập"""
+        with self._lock:
+            records, self._records = self._records, []
+        if not records:
+            return None
+
+        # Thời gian riêng (self time) của mỗi stack = tổng thời gian - thời gian các stack con
+        totals = {}
+        children = {}
+        for stack, elapsed, _ in records:
+            totals[stack] = totals.get(stack, 0.0) + elapsed
+            if len(stack) > 1:
+                children[stack[:-1]] = children.get(stack[:-1], 0.0) + elapsed
+
+        summary = {}
+        for stack, elapsed, memory in records:
+            entry = summary.setdefault(stack[-1], {'count': 0, 'total_s': 0.0, 'max_s': 0.0, self.memory_field: 0})
+            entry['count'] += 1
+            entry['total_s'] += elapsed
+            entry['max_s'] = max(entry['max_s'], elapsed)
+            entry[self.memory_field] += memory
+        for entry in summary.values():
+            entry['mean_s'] = entry['total_s'] / entry['count']
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        prefix = os.path.join(self.output_dir, datetime.now().strftime("%Y%m%d%H%M%S"))
+        folded_path = f"{prefix}.folded"
+        summary_path = f"{prefix}_summary.json"
+
+        with open(folded_path, 'w') as f:
+            for stack, total in sorted(totals.items()):
+                self_us = int(round(max(0.0, total - children.get(stack, 0.0)) * 1_000_000))
+                if self_us > 0:
+                    f.write(f"{';'.join(stack)} {self_us}\n")
+
+        with open(summary_path, 'w') as f:
+            json.dump(dict(sorted(summary.items(), key=lambda item: -item[1]['total_s'])), f, indent=2)
+
+        logging.info(f"Đã ghi profiling: {folded_path}, {summary_path}")
+        return folded_path, summary_path
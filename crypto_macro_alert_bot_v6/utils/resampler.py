@@ -0,0 +1,145 @@
+import logging
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.ohlcv_cache import OHLCV_COLUMNS, OHLCVRingBuffer, TIMEFRAME_UNITS_MS, timeframe_to_ms
+
+# Nến tuần của sàn bắt đầu từ thứ Hai 00:00 UTC; mốc epoch (1970-01-01) là thứ Năm
+WEEK_OFFSET_MS = 4 * TIMEFRAME_UNITS_MS['d']
+
+def bucket_starts(open_times_ms, timeframe):
+    """Thời điểm mở (ms, UTC) của nến khung lớn chứa từng nến, căn theo ranh giới của sàn"""
+    interval_ms = timeframe_to_ms(timeframe)
+    offset_ms = WEEK_OFFSET_MS if timeframe.endswith('w') else 0
+    return (open_times_ms - offset_ms) // interval_ms * interval_ms + offset_ms
+
+def resample_ohlcv(df, timeframe, drop_partial_first=True):
+    """Gộp nến OHLCV sang khung thời gian lớn hơn bằng ufunc.reduceat.
+
+    drop_partial_first: bỏ nến khung lớn đầu tiên nếu dữ liệu bắt đầu giữa nến đó
+    (thiếu các nến nhỏ đầu tiên nên giá mở/cao/thấp/khối lượng không đúng).
+    """
+    index = df.index
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    open_times = index.to_numpy(dtype='datetime64[ms]').view(np.int64)
+    starts = bucket_starts(open_times, timeframe)
+
+    # Vị trí nến nhỏ đầu tiên của mỗi nến khung lớn (dữ liệu đã sắp xếp theo thời gian)
+    first = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]]) if len(starts) else np.empty(0, dtype=int)
+    last = np.r_[first[1:] - 1, len(starts) - 1] if len(first) else first
+
+    values = {column: df[column].to_numpy(dtype=float) for column in OHLCV_COLUMNS}
+    resampled = {
+        'open': values['open'][first],
+        'high': np.maximum.reduceat(values['high'], first) if len(first) else np.empty(0),
+        'low': np.minimum.reduceat(values['low'], first) if len(first) else np.empty(0),
+        'close': values['close'][last],
+        'volume': np.add.reduceat(values['volume'], first) if len(first) else np.empty(0)
+    }
+
+    bucket_index = pd.DatetimeIndex(starts[first].astype('datetime64[ms]').astype('datetime64[ns]'), name=df.index.name)
+    if df.index.tz is not None:
+        bucket_index = bucket_index.tz_localize('UTC').tz_convert(df.index.tz)
+    result = pd.DataFrame(resampled, index=bucket_index)
+
+    if drop_partial_first and len(first) and starts[0] < open_times[0]:
+        result = result.iloc[1:]
+    return result
+
+class TimeframeResampler:
+    """Chỉ tải khung thời gian nhỏ nhất, dựng các khung lớn hơn từ dữ liệu đó.
+
+    Mỗi khung lớn được tải trực tiếp một lần để có lịch sử ban đầu; sau đó mỗi chu
+    kỳ chỉ các nến cuối (đang hình thành và vừa đóng) được dựng lại từ khung nhỏ.
+    Khung không chia hết cho khung nhỏ, cần nhiều nến nhỏ hơn cửa sổ dữ liệu
+    (vd. 1w từ 1h với 100 nến) hoặc không quy đổi được ra mili giây (vd. 1M) vẫn
+    được tải trực tiếp. DataFrame trả về là bản sao, không bị lần cập nhật sau ghi đè.
+    """
+
+    def __init__(self, fetch_klines, timeframes, capacity=100, base_fetch=None, max_age=30, clock=time.time):
+        # fetch_klines(symbol, timeframe, limit) -> DataFrame OHLCV
+        self.fetch_klines = fetch_klines
+        # base_fetch(symbol, timeframe) -> DataFrame tải trực tiếp (vd. OHLCVCache.get),
+        # dùng cho khung nhỏ nhất và các khung không dựng được từ khung nhỏ
+        self.base_fetch = base_fetch or (lambda symbol, timeframe: fetch_klines(symbol, timeframe, limit=capacity))
+        self.capacity = capacity
+        self.max_age = max_age
+        self.clock = clock
+
+        durations = {}
+        for timeframe in timeframes:
+            try:
+                durations[timeframe] = timeframe_to_ms(timeframe)
+            except ValueError:
+                logging.info(f"Khung {timeframe} không dựng được từ khung nhỏ, sẽ tải trực tiếp")
+
+        self.base_timeframe = min(durations, key=durations.get) if durations else None
+        self.derived_timeframes = {
+            timeframe for timeframe, duration in durations.items()
+            if timeframe != self.base_timeframe
+            and duration % durations[self.base_timeframe] == 0
+            and duration // durations[self.base_timeframe] <= capacity
+        }
+
+        self.buffers = {}
+        self._base_frames = {}
+        self._locks = {}
+
+    def get(self, symbol, timeframe):
+        """DataFrame nến cho cặp/khung thời gian, khung lớn được dựng từ khung nhỏ nhất"""
+        if timeframe == self.base_timeframe:
+            # Khung nhỏ được giữ lại để dựng các khung lớn: trả về bản sao cho bên phân tích
+            return self._base_frame(symbol).copy()
+        if timeframe not in self.derived_timeframes:
+            return self.base_fetch(symbol, timeframe)
+
+        with self._lock(symbol, timeframe):
+            buffer = self.buffers.get((symbol, timeframe))
+            if buffer is None:
+                return self._bootstrap(symbol, timeframe)
+
+            base = self._base_frame(symbol)
+            if base.empty or not isinstance(base.index, pd.DatetimeIndex):
+                return self._bootstrap(symbol, timeframe)
+
+            if not buffer.merge(resample_ohlcv(base, timeframe)):
+                # Nến cuối đã lưu nằm ngoài cửa sổ khung nhỏ (bot dừng lâu) -> tải lại trực tiếp
+                logging.info(f"Không dựng được {symbol}-{timeframe} từ {self.base_timeframe}, tải lại trực tiếp")
+                return self._bootstrap(symbol, timeframe)
+
+            return buffer.to_frame(copy=True)
+
+    def _bootstrap(self, symbol, timeframe):
+        """Tải trực tiếp lịch sử của khung lớn và nạp vào bộ đệm"""
+        df = self.fetch_klines(symbol, timeframe, limit=self.capacity)
+        if df.empty or not isinstance(df.index, pd.DatetimeIndex):
+            self.buffers.pop((symbol, timeframe), None)
+            return df
+
+        buffer = OHLCVRingBuffer(self.capacity)
+        buffer.load(df)
+        self.buffers[(symbol, timeframe)] = buffer
+        return buffer.to_frame(copy=True)
+
+    def _base_frame(self, symbol):
+        """Dữ liệu khung nhỏ nhất, chỉ tải lại khi đã cũ hơn max_age giây (một lần mỗi chu kỳ).
+
+        Khi tải lại, DataFrame mới thay cho DataFrame cũ chứ không ghi đè lên nó, nên
+        các khung lớn đang được dựng từ dữ liệu cũ không bị ảnh hưởng.
+        """
+        with self._lock(symbol, self.base_timeframe):
+            cached = self._base_frames.get(symbol)
+            now = self.clock()
+            if cached is not None and now - cached[0] < self.max_age:
+                return cached[1]
+
+            df = self.base_fetch(symbol, self.base_timeframe)
+            self._base_frames[symbol] = (now, df)
+            return df
+
+    def _lock(self, symbol, timeframe):
+        return self._locks.setdefault((symbol, timeframe), threading.Lock())
@@ -0,0 +1,269 @@
+import math
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+NAN = float('nan')
+
+def _tail(values, size):
+    """size phần tử cuối của deque (dưới dạng list)"""
+    return list(values)[max(0, len(values) - size):]
+
+class EMAState:
+    """EMA đệ quy, tương đương Series.ewm(alpha=alpha, min_periods=min_periods, adjust=False).mean().
+
+    Các giá trị NaN ở đầu chuỗi được bỏ qua (EMA bắt đầu từ giá trị hợp lệ đầu tiên).
+    """
+
+    def __init__(self, alpha, min_periods):
+        self.alpha = alpha
+        self.min_periods = min_periods
+        self.value = NAN
+        self.count = 0
+
+    @classmethod
+    def from_span(cls, span):
+        return cls(2 / (span + 1), span)
+
+    def update(self, x, commit=True):
+        """Thêm một giá trị; commit=False chỉ tính thử, không thay đổi trạng thái"""
+        if math.isnan(x):
+            value, count = self.value, self.count
+        elif self.count == 0:
+            value, count = x, 1
+        else:
+            value, count = (1 - self.alpha) * self.value + self.alpha * x, self.count + 1
+
+        if commit:
+            self.value, self.count = value, count
+        return value if count >= self.min_periods else NAN
+
+class RSIState:
+    """RSI Wilder, tương đương ta.momentum.RSIIndicator"""
+
+    def __init__(self, window=14):
+        self.ema_up = EMAState(1 / window, window)
+        self.ema_down = EMAState(1 / window, window)
+        self.prev_close = NAN
+
+    def update(self, close, commit=True):
+        # Nến đầu tiên không có nến trước: mức tăng/giảm bằng 0 (giống diff().where(...))
+        diff = close - self.prev_close
+        up = diff if diff > 0 else 0.0
+        down = -diff if diff < 0 else 0.0
+        ema_up = self.ema_up.update(up, commit)
+        ema_down = self.ema_down.update(down, commit)
+        if commit:
+            self.prev_close = close
+
+        if ema_down == 0:
+            return 100.0
+        return 100 - (100 / (1 + ema_up / ema_down))
+
+class MACDState:
+    """MACD, đường tín hiệu và histogram, tương đương ta.trend.MACD"""
+
+    def __init__(self, fast=12, slow=26, sign=9):
+        self.ema_fast = EMAState.from_span(fast)
+        self.ema_slow = EMAState.from_span(slow)
+        self.ema_signal = EMAState.from_span(sign)
+
+    def update(self, close, commit=True):
+        macd = self.ema_fast.update(close, commit) - self.ema_slow.update(close, commit)
+        signal = self.ema_signal.update(macd, commit)
+        return macd, signal, macd - signal
+
+class StochasticState:
+    """Stochastic %K/%D, tương đương ta.momentum.StochasticOscillator.
+
+    Giữ `window` nến gần nhất trong deque nên mỗi lần cập nhật tốn O(window),
+    không phụ thuộc độ dài lịch sử.
+    """
+
+    def __init__(self, window=14, smooth_window=3):
+        self.window = window
+        self.smooth_window = smooth_window
+        self.highs = deque(maxlen=window)
+        self.lows = deque(maxlen=window)
+        self.k_values = deque(maxlen=smooth_window)
+
+    def update(self, high, low, close, commit=True):
+        highs = _tail(self.highs, self.window - 1) + [high]
+        lows = _tail(self.lows, self.window - 1) + [low]
+        if len(highs) < self.window:
+            k = NAN
+        else:
+            highest, lowest = max(highs), min(lows)
+            k = 100 * (close - lowest) / (highest - lowest) if highest != lowest else NAN
+
+        k_values = _tail(self.k_values, self.smooth_window - 1) + [k]
+        d = sum(k_values) / self.smooth_window if len(k_values) == self.smooth_window else NAN
+
+        if commit:
+            self.highs.append(high)
+            self.lows.append(low)
+            self.k_values.append(k)
+        return k, d
+
+class OBVState:
+    """On-Balance Volume, tương đương ta.volume.OnBalanceVolumeIndicator.
+
+    Theo quy ước của ta: nến không giảm giá (kể cả nến đầu tiên) cộng khối lượng.
+    """
+
+    def __init__(self):
+        self.value = 0.0
+        self.prev_close = NAN
+
+    def update(self, close, volume, commit=True):
+        value = self.value + (-volume if close < self.prev_close else volume)
+        if commit:
+            self.value, self.prev_close = value, close
+        return value
+
+def state_options(symbol_config):
+    """Tham số IndicatorState từ cấu hình của một cặp tiền (Config.SYMBOL_CONFIGS)"""
+    options = {}
+    if 'rsi_period' in symbol_config:
+        options['rsi_window'] = symbol_config['rsi_period']
+    if all(key in symbol_config for key in ('macd_fast', 'macd_slow', 'macd_signal')):
+        options['macd_windows'] = (symbol_config['macd_fast'], symbol_config['macd_slow'], symbol_config['macd_signal'])
+    if all(key in symbol_config for key in ('stoch_k', 'stoch_d')):
+        options['stoch_windows'] = (symbol_config['stoch_k'], symbol_config['stoch_d'])
+    return options
+
+class IndicatorState:
+    """Trạng thái các chỉ báo của một cặp/khung thời gian, cập nhật O(1) cho mỗi nến.
+
+    Giá trị của `history` nến đã đóng gần nhất được giữ lại để dựng các cột chỉ
+    báo cho cả cửa sổ dữ liệu mà không phải tính lại.
+    """
+
+    def __init__(self, rsi_window=14, macd_windows=(12, 26, 9), stoch_windows=(14, 3), ema_windows=(20, 50),
+                 history=1000):
+        self.rsi = RSIState(rsi_window)
+        self.macd = MACDState(*macd_windows)
+        self.stochastic = StochasticState(*stoch_windows)
+        self.obv = OBVState()
+        self.emas = {window: EMAState.from_span(window) for window in ema_windows}
+        # Chu kỳ đã dùng, để bên dùng các cột biết chúng có khớp với tham số của mình không
+        self.windows = {
+            'rsi_window': rsi_window,
+            'macd_windows': tuple(macd_windows),
+            'stoch_windows': tuple(stoch_windows)
+        }
+        self.columns = ['rsi', 'macd', 'macd_signal', 'macd_hist', 'stoch_k', 'stoch_d', 'obv']
+        self.columns += [f'ema_{window}' for window in ema_windows]
+        self.history = deque(maxlen=history)
+        self.last_closed_time = None
+        self.last_closed_values = None
+
+    def update(self, open_time, high, low, close, volume, commit=True):
+        """Thêm nến đã đóng (commit=True) hoặc tính thử cho nến đang hình thành.
+
+        Nến đang hình thành có thể được tính lại nhiều lần với giá mới mà không
+        làm sai trạng thái, vì chỉ nến đã đóng mới được ghi vào.
+        """
+        macd, macd_signal, macd_hist = self.macd.update(close, commit)
+        stoch_k, stoch_d = self.stochastic.update(high, low, close, commit)
+        values = {
+            'rsi': self.rsi.update(close, commit),
+            'macd': macd,
+            'macd_signal': macd_signal,
+            'macd_hist': macd_hist,
+            'stoch_k': stoch_k,
+            'stoch_d': stoch_d,
+            'obv': self.obv.update(close, volume, commit)
+        }
+        for window, ema in self.emas.items():
+            values[f'ema_{window}'] = ema.update(close, commit)
+
+        if commit:
+            self.last_closed_time = open_time
+            self.last_closed_values = values
+            self.history.append(values)
+        return values
+
+    def preview(self, open_time, high, low, close, volume):
+        """Giá trị chỉ báo nếu nến đang hình thành đóng ở giá hiện tại"""
+        return self.update(open_time, high, low, close, volume, commit=False)
+
+    def frame(self, index, closed_count, forming_values=None):
+        """Các cột chỉ báo cho `index`: closed_count nến đã đóng gần nhất (+ nến đang hình thành)"""
+        rows = _tail(self.history, closed_count)
+        if forming_values is not None:
+            rows.append(forming_values)
+        # Lịch sử ngắn hơn cửa sổ dữ liệu: các nến đầu không có giá trị
+        missing = len(index) - len(rows)
+        columns = {}
+        for column in self.columns:
+            values = np.full(len(index), np.nan)
+            values[missing:] = [row[column] for row in rows]
+            columns[column] = values
+        return pd.DataFrame(columns, index=index)
+
+class IndicatorStateStore:
+    """Trạng thái chỉ báo theo (symbol, timeframe), đồng bộ từ DataFrame nến mỗi chu kỳ.
+
+    symbol_configs: Config.SYMBOL_CONFIGS, để chu kỳ RSI/MACD/Stochastic của mỗi
+    cặp giống đường tính theo lô; state_options là giá trị mặc định.
+    """
+
+    def __init__(self, symbol_configs=None, **state_options):
+        self.symbol_configs = symbol_configs or {}
+        self.state_options = state_options
+        self.states = {}
+        self._locks = {}
+
+    def options_for(self, symbol):
+        symbol_config = self.symbol_configs.get(symbol, self.symbol_configs.get('DEFAULT', {}))
+        return {**self.state_options, **state_options(symbol_config)}
+
+    def windows(self, symbol, timeframe):
+        """Chu kỳ RSI/MACD/Stochastic của trạng thái (symbol, timeframe) đã đồng bộ"""
+        return self.states[(symbol, timeframe)].windows
+
+    def sync(self, symbol, timeframe, df):
+        """Đưa các nến đã đóng mới vào trạng thái, trả về các cột chỉ báo theo index của df.
+
+        Nến cuối cùng của dữ liệu sàn luôn được coi là đang hình thành: giá trị của
+        nó chỉ là giá trị tính thử và được ghi vào trạng thái ở chu kỳ sau, khi đã
+        có nến mới hơn. Trạng thái được dựng lại từ đầu khi chưa có, hoặc khi dữ
+        liệu không còn chứa nến đã đóng cuối cùng (bị ngắt quãng).
+        """
+        if df.empty:
+            return None
+
+        lock = self._locks.setdefault((symbol, timeframe), threading.Lock())
+        with lock:
+            open_times = self._open_times_ms(df.index)
+            high = df['high'].to_numpy(dtype=float)
+            low = df['low'].to_numpy(dtype=float)
+            close = df['close'].to_numpy(dtype=float)
+            volume = df['volume'].to_numpy(dtype=float)
+            closed_count = len(df) - 1
+
+            state = self.states.get((symbol, timeframe))
+            if state is None or not np.any(open_times[:closed_count] == state.last_closed_time):
+                state = IndicatorState(**self.options_for(symbol))
+                self.states[(symbol, timeframe)] = state
+                start = 0
+            else:
+                start = int(np.searchsorted(open_times, state.last_closed_time, side='right'))
+
+            def row(i):
+                return int(open_times[i]), float(high[i]), float(low[i]), float(close[i]), float(volume[i])
+
+            for i in range(start, closed_count):
+                state.update(*row(i))
+            return state.frame(df.index, closed_count, state.preview(*row(closed_count)))
+
+    @staticmethod
+    def _open_times_ms(index):
+        if isinstance(index, pd.DatetimeIndex):
+            if index.tz is not None:
+                index = index.tz_convert('UTC').tz_localize(None)
+            return index.to_numpy(dtype='datetime64[ms]').view(np.int64)
+        return np.asarray(index, dtype=np.int64)
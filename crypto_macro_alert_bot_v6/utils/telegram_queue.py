@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import time
+from datetime import timedelta
+
+try:
+    from telegram.error import BadRequest, NetworkError
+except ImportError:  # python-telegram-bot chưa được cài: chỉ dựa vào retry_after và lỗi mạng của Python
+    BadRequest = NetworkError = None
+
+# Giới hạn độ dài một tin nhắn văn bản của Telegram
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096
+
+class TokenBucket:
+    """Token bucket bất đồng bộ: tối đa `capacity` lượt liên tiếp, hồi `rate` lượt mỗi giây"""
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated_at = clock()
+
+    async def acquire(self):
+        while True:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        """Chặn bucket trong `seconds` giây (khi Telegram trả về retry_after)"""
+        self.tokens = 1 - seconds * self.rate
+        self.updated_at = self.clock()
+
+def merge_messages(messages, limit=TELEGRAM_MAX_MESSAGE_LENGTH, separator="\n\n"):
+    """Gộp các tin nhắn thành ít tin nhất có thể, mỗi tin không vượt quá `limit` ký tự.
+
+    Tin nhắn dài hơn `limit` được tách theo dòng (hoặc cắt cứng nếu một dòng quá dài).
+    """
+    return [separator.join(group) for group in group_messages(messages, limit, separator)]
+
+def group_messages(messages, limit=TELEGRAM_MAX_MESSAGE_LENGTH, separator="\n\n"):
+    """Như merge_messages nhưng trả về các phần của từng tin đã gộp (để gửi lại riêng khi cần)"""
+    parts = []
+    for message in messages:
+        if len(message) <= limit:
+            parts.append(message)
+            continue
+        chunk = ""
+        for line in message.splitlines(keepends=True):
+            while len(line) > limit:
+                if chunk:
+                    parts.append(chunk)
+                    chunk = ""
+                parts.append(line[:limit])
+                line = line[limit:]
+            if len(chunk) + len(line) > limit:
+                parts.append(chunk)
+                chunk = ""
+            chunk += line
+        if chunk:
+            parts.append(chunk)
+
+    groups = []
+    length = 0
+    for part in parts:
+        if groups and length + len(separator) + len(part) <= limit:
+            groups[-1].append(part)
+            length += len(separator) + len(part)
+        else:
+            groups.append([part])
+            length = len(part)
+    return groups
+
+def is_retryable(error):
+    """Lỗi tạm thời (flood control, lỗi mạng/timeout, lỗi 5xx của Telegram) mới đáng thử lại.
+
+    BadRequest (sai Markdown, chat không tồn tại...) là lớp con của NetworkError trong
+    python-telegram-bot nhưng gửi lại cũng sẽ lỗi y hệt.
+    """
+    if getattr(error, 'retry_after', None) is not None:
+        return True
+    if BadRequest is not None and isinstance(error, BadRequest):
+        return False
+    if NetworkError is not None and isinstance(error, NetworkError):
+        return True
+    return isinstance(error, (OSError, asyncio.TimeoutError))
+
+class TelegramDeliveryQueue:
+    """Hàng đợi gửi Telegram chạy nền, giới hạn tốc độ theo từng chat và gộp tin nhắn theo chu kỳ.
+
+    Tin nhắn văn bản được giữ lại đến khi flush() rồi gộp thành các tin <= 4096 ký tự;
+    ảnh được gửi riêng theo thứ tự. Lỗi có `retry_after` (429 flood control) được
+    thử lại sau đúng khoảng thời gian đó, lỗi mạng/5xx thử lại với backoff tăng dần;
+    các lỗi khác (BadRequest, chat không tồn tại...) bị bỏ qua ngay để không chặn hàng đợi.
+    Tin gộp bị BadRequest (vd. một cảnh báo sai Markdown) được gửi lại từng phần, để
+    chỉ phần lỗi bị bỏ qua chứ không mất cả nhóm.
+    """
+
+    def __init__(self, telegram, rate_per_chat=1.0, burst=3, max_retries=5, backoff=1.0,
+                 max_backoff=60.0, max_message_length=TELEGRAM_MAX_MESSAGE_LENGTH):
+        self.telegram = telegram
+        self.rate_per_chat = rate_per_chat
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_message_length = max_message_length
+
+        self._pending = {}  # { chat_id: [tin nhắn chờ gộp] }
+        self._buckets = {}
+        self._queue = None
+        self._worker = None
+
+    def add_message(self, text, chat_id=None):
+        """Thêm tin nhắn văn bản, sẽ được gộp và gửi ở lần flush() tiếp theo"""
+        self._pending.setdefault(chat_id, []).append(text)
+
+    async def send_photo(self, photo, caption=None, chat_id=None):
+        """Đưa ảnh vào hàng đợi gửi (photo là đường dẫn file hoặc buffer nhị phân)"""
+        await self._put(('photo', chat_id, photo, caption))
+
+    async def flush(self):
+        """Gộp các tin nhắn đang chờ và đưa vào hàng đợi gửi"""
+        pending, self._pending = self._pending, {}
+        for chat_id, messages in pending.items():
+            for group in group_messages(messages, self.max_message_length):
+                await self._put(('message', chat_id, "\n\n".join(group), group))
+
+    async def drain(self):
+        """Chờ gửi xong mọi thứ trong hàng đợi"""
+        await self.flush()
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def _put(self, item):
+        self._ensure_worker()
+        await self._queue.put(item)
+
+    def _ensure_worker(self):
+        # Worker gắn với event loop đang chạy; tạo lại nếu loop đã thay đổi hoặc worker đã dừng
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._worker.get_loop() is not loop:
+            self._queue = asyncio.Queue()
+            self._buckets = {}
+            self._worker = loop.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            item = await self._queue.get()
+            try:
+                await self._deliver(item)
+            except Exception as e:
+                logging.error(f"❌ Lỗi khi gửi Telegram: {e}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, item):
+        # Phần tử cuối: caption với ảnh, danh sách các phần đã gộp với tin nhắn văn bản
+        kind, chat_id, payload, extra = item
+        caption = extra if kind == 'photo' else None
+        parts = extra if kind == 'message' else None
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._buckets[chat_id] = TokenBucket(self.rate_per_chat, self.burst)
+
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire()
+            try:
+                await self._send(kind, chat_id, payload, caption)
+                return
+            except Exception as e:
+                if not is_retryable(e):
+                    if parts and len(parts) > 1 and (BadRequest is None or isinstance(e, BadRequest)):
+                        # Một phần sai định dạng làm hỏng cả tin gộp: gửi lại từng phần
+                        logging.warning(f"⚠️ Tin gộp bị từ chối ({e}), gửi lại {len(parts)} phần riêng lẻ")
+                        for part in parts:
+                            await self._deliver(('message', chat_id, part, [part]))
+                        return
+                    logging.error(f"❌ Bỏ qua tin nhắn Telegram (lỗi không thể thử lại): {e}")
+                    return
+                if attempt == self.max_retries:
+                    logging.error(f"❌ Bỏ qua tin nhắn Telegram sau {attempt + 1} lần thử: {e}")
+                    return
+                delay = self._retry_delay(e, attempt)
+                logging.warning(f"⚠️ Gửi Telegram thất bại ({e}), thử lại sau {delay:.1f}s")
+                if getattr(e, 'retry_after', None) is not None:
+                    # Flood control: chặn cả chat, lần acquire() tiếp theo sẽ chờ đủ thời gian
+                    bucket.pause(delay)
+                else:
+                    await asyncio.sleep(delay)
+
+    async def _send(self, kind, chat_id, payload, caption):
+        kwargs = {} if chat_id is None else {'chat_id': chat_id}
+        if kind == 'photo':
+            # Buffer ảnh đã bị đọc ở lần thử trước: đưa con trỏ về đầu
+            if hasattr(payload, 'seek'):
+                payload.seek(0)
+            await self.telegram.send_photo(payload, caption=caption, **kwargs)
+        else:
+            await self.telegram.send_message(payload, **kwargs)
+
+    def _retry_delay(self, error, attempt):
+        """retry_after của Telegram nếu có, ngược lại là backoff lũy thừa"""
+        retry_after = getattr(error, 'retry_after', None)
+        if isinstance(retry_after, timedelta):
+            return retry_after.total_seconds()
+        if retry_after is not None:
+            return float(retry_after)
+        return min(self.max_backoff, self.backoff * (2 ** attempt))